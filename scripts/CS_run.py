@@ -10,7 +10,7 @@ To view a copy of this license,
 visit http://creativecommons.org/licenses/by-nc-sa/4.0/.
 """
 
-import scipy as sp
+import numpy as np
 import sys
 import os
 sys.path.append('../src')
@@ -0,0 +1,53 @@
+"""
+Run CS decoding runs for all indices of a set of iterated variables, 
+distributing the runs over processes on the local machine.
+
+This work is licensed under the 
+Creative Commons Attribution-NonCommercial-ShareAlike 4.0 
+International License. 
+To view a copy of this license,
+visit http://creativecommons.org/licenses/by-nc-sa/4.0/.
+"""
+
+import numpy as np
+import sys
+from multiprocessing import Pool
+sys.path.append('../src')
+from utils import get_flag
+from load_specs import read_specs_file
+from CS_run import CS_run
+
+
+def CS_sweep(data_flag, num_jobs=None):
+	"""
+	Run CS_run for every combination of iterated variable indices in 
+	the specifications file. The runs are independent, so they are 
+	distributed over num_jobs worker processes (all cores if None);
+	each run saves its own object file as with CS_run.
+	
+	Args:
+		data_flag: Name of specifications file.
+		num_jobs: Number of worker processes.
+	"""
+	
+	list_dict = read_specs_file(data_flag)
+	iter_vars = list_dict['iter_vars']
+	iter_vars_dims = [len(iter_vars[iter_var]) for iter_var in iter_vars]
+	run_args = [(data_flag, list(iter_var_idxs)) for iter_var_idxs in 
+				np.ndindex(*iter_vars_dims)]
+	
+	pool = Pool(num_jobs)
+	try:
+		pool.starmap(CS_run, run_args, chunksize=1)
+	finally:
+		pool.close()
+		pool.join()
+	
+
+if __name__ == '__main__':
+	data_flag = get_flag()
+	if len(sys.argv) > 2:
+		num_jobs = int(sys.argv[2])
+	else:
+		num_jobs = None
+	CS_sweep(data_flag, num_jobs)
@@ -10,12 +10,12 @@ visit http://creativecommons.org/licenses/by-nc-sa/4.0/.
 """
 
 
-import scipy as sp
+import numpy as np
 import sys
 sys.path.append('../src')
 from load_specs import read_specs_file
 from load_data import load_objects
-from save_data import save_aggregated_object_list
+from save_data import save_aggregated_object_list, save_aggregated_arrays
 from utils import get_flags
 
 
@@ -39,25 +39,24 @@ def aggregate_objects(data_flags, skip_missing=False):
 		iter_vars_dims = []
 		for iter_var in iter_vars:
 			iter_vars_dims.append(len(iter_vars[iter_var]))		
-		it = sp.nditer(sp.zeros(iter_vars_dims), flags = ['multi_index'])
 
 		obj_list  = []
-		while not it.finished:
+		for idx in np.ndindex(*iter_vars_dims):
 			sys.stdout.flush()
-			print (it.multi_index)
+			print (idx)
 			if skip_missing == False:
-				CS_obj = load_objects(list(it.multi_index), data_flag)
+				CS_obj = load_objects(list(idx), data_flag)
 			else:
 				try:
-					CS_obj = load_objects(list(it.multi_index), data_flag)
+					CS_obj = load_objects(list(idx), data_flag)
 				except (IOError, OSError):
-					print ('Skipping item %s...' % list(it.multi_index))	
+					print ('Skipping item %s...' % list(idx))	
 					CS_obj = None
 			
 			obj_list.append(CS_obj)
-			it.iternext()
 
 		save_aggregated_object_list(obj_list, data_flag)
+		save_aggregated_arrays(obj_list, iter_vars_dims, data_flag)
 		
 
 if __name__ == '__main__':
@@ -12,7 +12,7 @@ visit http://creativecommons.org/licenses/by-nc-sa/4.0/.
 """
 
 
-import scipy as sp
+import numpy as np
 import sys
 sys.path.append('../src')
 from load_specs import read_specs_file
@@ -30,9 +30,6 @@ def aggregate_temporal_objects(data_flags):
 		data_flags: Identifiers for saving and loading.
 	"""
 
-	temporal_structs_to_save = ['dSs', 'dSs_est', 'Yy', 'dYy', 'eps', 'Yy0', 
-								'mu_dSs', 'Ss0']
-	
 	if isinstance(data_flags, str):
 		data_flags = [data_flags]
 	
@@ -42,56 +39,37 @@ def aggregate_temporal_objects(data_flags):
 		iter_vars_dims = []
 		for iter_var in iter_vars:
 			iter_vars_dims.append(len(iter_vars[iter_var]))		
-		it = sp.nditer(sp.zeros(iter_vars_dims), flags = ['multi_index'])
 		
-		CS_init_array = load_objects(list(it.multi_index), data_flag)
+		temporal_data = load_objects([0]*len(iter_vars_dims), data_flag)
 
 		# Dictionary to save all object at time 0; this will contain all 
 		# non-temporal info for each iterated variable.
 		data = dict()
 		data['init_objs'] = []
-		nT = len(CS_init_array[0].signal_trace_Tt)
-
+		
 		# Assign data structures of appropriate shape for the temporal variable
-		structs = dict()
-		for struct_name in temporal_structs_to_save:
-			try:
-				tmp_str = 'structs[struct_name] = CS_init_array[0].%s' \
-							% struct_name
-				exec(tmp_str)
-			except:
-				print('%s not an attribute of the CS object' % struct_name)
-				continue
-
-			# shape is (num timesteps, iterated var ranges, variable shape); 
-			# if a float or integer, shape is just time and iter vars.
-			struct_shape = (nT, ) +  tuple(iter_vars_dims)
-			if hasattr(structs[struct_name], 'shape'):
-				struct_shape += (structs[struct_name].shape)
-			data['%s' % struct_name] = sp.zeros(struct_shape)
+		# shape is (num timesteps, iterated var ranges, variable shape); 
+		# if a float or integer, shape is just time and iter vars.
+		struct_names = [key for key in temporal_data if key != 'init_obj']
+		for struct_name in struct_names:
+			struct_shape = temporal_data[struct_name].shape
+			struct_shape = struct_shape[:1] + tuple(iter_vars_dims) + \
+							struct_shape[1:]
+			data[struct_name] = np.zeros(struct_shape)
 
 		# Iterate over all objects to be aggregated
-		structs = dict()
-		while not it.finished:
+		for idx in np.ndindex(*iter_vars_dims):
 			
-			print('Loading index:', it.multi_index)
-			temporal_CS_array = load_objects(list(it.multi_index), data_flag)
+			print('Loading index:', idx)
+			temporal_data = load_objects(list(idx), data_flag)
 			
 			# Save full object at time 0, contains non-temporal data.
-			data['init_objs'].append(temporal_CS_array[0])
+			data['init_objs'].append(temporal_data['init_obj'])
 		
-			# Grab all the temporal structures, timepoint-by-timepoint
-			for iT in range(nT):
-
-				full_idx = (iT, ) + it.multi_index
-
-				for struct_name in temporal_structs_to_save:
-					tmp_str = 'structs[struct_name] = temporal_CS_array[iT].%s' \
-								% struct_name
-					exec(tmp_str)
-					data[struct_name][full_idx] = structs[struct_name]
-			
-			it.iternext()
+			# Temporal structures are stored as (num timesteps, variable shape)
+			full_idx = (slice(None), ) + idx
+			for struct_name in struct_names:
+				data[struct_name][full_idx] = temporal_data[struct_name]
 
 		save_aggregated_temporal_objects(data, data_flag)
 
@@ -9,7 +9,7 @@ To view a copy of this license,
 visit http://creativecommons.org/licenses/by-nc-sa/4.0/.
 """
 
-import scipy as sp
+import numpy as np
 import sys
 import os
 sys.path.append('../src')
@@ -38,7 +38,7 @@ def nn_run(data_flag, iter_var_idxs):
 	obj.data_flag = data_flag
 	
 	# Set the signals and free energy, depending if adaptive or not.
-	if 'run_type' in list(list_dict['run_specs'].keys()):
+	if 'run_type' in list_dict['run_specs']:
 		val = list_dict['run_specs']['run_type']
 		if val[0] == 'nn':
 			obj.init_nn_frontend()
@@ -12,22 +12,28 @@ To view a copy of this license,
 visit http://creativecommons.org/licenses/by-nc-sa/4.0/.
 """
 
-import scipy as sp
+import numpy as np
 import sys
 import copy
+from concurrent.futures import ThreadPoolExecutor
 sys.path.append('../src')
 from four_state_receptor_CS import four_state_receptor_CS
 from utils import get_flag
 from save_data import dump_objects
 from load_specs import read_specs_file, compile_all_run_vars
 from encode_CS import single_encode_CS
+from optimize import decode_OMP_batch
 
 
+TEMPORAL_STRUCTS_TO_SAVE = ['dSs', 'dSs_est', 'Yy', 'dYy', 'eps', 'Yy0', 
+							'mu_dSs', 'Ss0']
+
 def temporal_CS_run(data_flag, iter_var_idxs,
 					mu_dSs_offset=0, mu_dSs_multiplier=1./3., 
 					sigma_dSs_offset=0, sigma_dSs_multiplier=1./9., 
 					signal_window=None, save_data=True, 
-					decode=True):
+					decode=True, checkpoint_interval=None, gram_tol=None, 
+					batch_decode=False):
 	"""
 	Run a CS decoding run for a full temporal signal trace.
 
@@ -36,10 +42,33 @@ def temporal_CS_run(data_flag, iter_var_idxs,
 	specs file indicates the full range of the iterated variable; this
 	script only produces output from one of those indices, so multiple
 	runs can be performed in parallel.
+	
+	Data is saved once at the end of the run. If checkpoint_interval is 
+	an integer, the partial run is also saved every checkpoint_interval
+	timesteps; timesteps not yet reached are zero in the saved arrays.
+	Checkpoints are written from a background thread while the run 
+	continues.
+	
+	For OMP decoding, if gram_tol is a float, the Gram matrix Rr^T Rr is
+	reused across timesteps until Rr has changed by more than gram_tol 
+	relative to the Rr it was computed from (in Frobenius norm).
+	
+	For OMP decoding, if batch_decode is True, the response matrices are
+	collected over the run and all timesteps are decoded together at the 
+	end, rather than one at a time.
+	
+	Returns:
+		temporal_data: dictionary; key 'init_obj' holds the CS object at 
+			the first timestep, and the keys in TEMPORAL_STRUCTS_TO_SAVE 
+			hold arrays of shape (num timesteps, variable shape).
 	"""
 	
 	assert mu_dSs_offset >= 0, "mu_dSs_offset kwarg must be >= 0"
 	assert sigma_dSs_offset >= 0, "sigma_dSs_offset kwarg must be >= 0"
+	if checkpoint_interval is not None:
+		assert checkpoint_interval > 0, "checkpoint_interval kwarg must be > 0"
+	if batch_decode == True:
+		assert decode == True, "batch_decode requires decode=True"
 	
 	# Aggregate all run specifications from the specs file; instantiate model
 	list_dict = read_specs_file(data_flag)
@@ -48,7 +77,7 @@ def temporal_CS_run(data_flag, iter_var_idxs,
 		
 	# Set the temporal signal array from file; truncate to signal window
 	obj.set_signal_trace()
-	assert sp.sum(obj.signal_trace <= 0) == 0, \
+	assert np.sum(obj.signal_trace <= 0) == 0, \
 		"Signal contains negative values; increase signal_trace_offset"
 	if signal_window is not None:
 		obj.signal_trace_Tt = obj.signal_trace_Tt[signal_window[0]: \
@@ -69,31 +98,51 @@ def temporal_CS_run(data_flag, iter_var_idxs,
 			print('Need to assign signal_trace_2 if setting Kk_split or ' \
 					'Kk_1 and Kk_2 nonzero') 
 			quit()
-		assert sp.sum(obj.signal_trace_2 <= 0) == 0, \
+		assert np.sum(obj.signal_trace_2 <= 0) == 0, \
 				"Signal_2 contains neg values; increase signal_trace_offset_2"
 		if signal_window is not None:
 			obj.signal_trace_2 = obj.signal_trace_2[signal_window[0]: \
 													signal_window[1]]
-			
-	obj_list = []
+	
+	# Estimation dSs values over the full signal trace(s)
+	mu_dSs_trace = mu_dSs_offset + obj.signal_trace*mu_dSs_multiplier
+	sigma_dSs_trace = sigma_dSs_offset + obj.signal_trace*sigma_dSs_multiplier
+	dual_odor = (obj.Kk_split is not None) and (obj.Kk_split != 0)
+	if dual_odor == True:
+		mu_dSs_2_trace = mu_dSs_offset + obj.signal_trace_2*mu_dSs_multiplier
+		sigma_dSs_2_trace = sigma_dSs_offset + \
+							obj.signal_trace_2*sigma_dSs_multiplier
+	
+	# Per-timestep outputs are stored in preallocated (nT, ...) arrays rather
+	# than deep copies of the full object at each timestep.
+	nT = len(obj.signal_trace_Tt)
+	temporal_data = dict()
+	dSs_est_prev = None
+	gram = None
+	gram_Rr = None
+	
+	# Single writer thread, so checkpoints are written in order
+	if (save_data == True) and (checkpoint_interval is not None):
+		executor = ThreadPoolExecutor(max_workers=1)
+		checkpoints = []
+	
 	for iT, dt in enumerate(obj.signal_trace_Tt):
-		print('%s/%s' % (iT + 1, len(obj.signal_trace)), end=' ')
-		sys.stdout.flush()
+		if iT % 100 == 0:
+			print('%s/%s' % (iT + 1, len(obj.signal_trace)), end=' ')
+			sys.stdout.flush()
 		
 		# Set mu_Ss0 from signal trace, if desired
 		if obj.set_mu_Ss0_temporal_signal == True:
 			obj.mu_Ss0 = obj.signal_trace[iT]
 		
 		# Set estimation dSs values from signal trace and kwargs
-		signal = obj.signal_trace[iT]
-		obj.mu_dSs = mu_dSs_offset + signal*mu_dSs_multiplier
-		obj.sigma_dSs = sigma_dSs_offset + signal*sigma_dSs_multiplier
+		obj.mu_dSs = mu_dSs_trace[iT]
+		obj.sigma_dSs = sigma_dSs_trace[iT]
 		
 		# Set estimation dSs values for dual odor if needed
-		if (obj.Kk_split is not None) and (obj.Kk_split != 0):
-			signal_2 = obj.signal_trace_2[iT]
-			obj.mu_dSs_2 = mu_dSs_offset + signal_2*mu_dSs_multiplier
-			obj.sigma_dSs_2 = sigma_dSs_offset + signal_2*sigma_dSs_multiplier
+		if dual_odor == True:
+			obj.mu_dSs_2 = mu_dSs_2_trace[iT]
+			obj.sigma_dSs_2 = sigma_dSs_2_trace[iT]
 		
 		# Encode / decode fully first time; then just update eps and responses
 		if iT == 0:
@@ -108,17 +157,68 @@ def temporal_CS_run(data_flag, iter_var_idxs,
 			obj.set_measured_activity()
 			obj.set_linearized_response()
 			
-		# Estimate signal at point iT
-		if decode==True:
-			obj.decode()
+		# Estimate signal at point iT; start from the previous estimate. For
+		# batch decoding, only store the response matrix for now.
+		if (decode == True) and (batch_decode == True):
+			if iT == 0:
+				assert obj.decode_opt_type == 'OMP', "batch_decode is only "\
+					"implemented for decode_opt_type 'OMP'"
+				Rr_trace = np.zeros((nT, ) + obj.Rr.shape)
+			Rr_trace[iT] = obj.Rr
+		elif decode == True:
+			
+			# Recompute the Gram matrix for OMP only once Rr has drifted
+			if (gram_tol is not None) and (obj.decode_opt_type == 'OMP'):
+				if (gram_Rr is None) or (np.linalg.norm(obj.Rr - gram_Rr) > 
+						gram_tol*np.linalg.norm(gram_Rr)):
+					gram_Rr = np.array(obj.Rr)
+					gram = np.dot(obj.Rr.T, obj.Rr)
+			obj.decode(warm_start=dSs_est_prev, gram=gram)
+			dSs_est_prev = obj.dSs_est
+		
+		# Keep full object at time 0 (holds all non-temporal data); allocate
+		# arrays for the temporal structures from their shapes at time 0.
+		if iT == 0:
+			temporal_data['init_obj'] = copy.deepcopy(obj)
+			for struct_name in TEMPORAL_STRUCTS_TO_SAVE:
+				if not hasattr(obj, struct_name):
+					continue
+				struct_shape = (nT, ) + np.shape(getattr(obj, struct_name))
+				temporal_data[struct_name] = np.zeros(struct_shape)
+		
+		for struct_name in TEMPORAL_STRUCTS_TO_SAVE:
+			if struct_name in temporal_data:
+				temporal_data[struct_name][iT] = getattr(obj, struct_name)
 		
-		# Deep copy to take all aspects of the object but not update it
-		obj_list.append(copy.deepcopy(obj))
+		if (save_data == True) and (checkpoint_interval is not None):
+			if (iT + 1) % checkpoint_interval == 0:
+				
+				# Snapshot the arrays; the loop keeps filling them in place
+				snapshot = dict()
+				for key, val in temporal_data.items():
+					if key == 'init_obj':
+						snapshot[key] = val
+					else:
+						snapshot[key] = np.copy(val)
+				checkpoints.append(executor.submit(dump_objects, snapshot, 
+									iter_var_idxs, data_flag, output=False))
+	
+	# Decode all timesteps at once from the stored responses
+	if batch_decode == True:
+		temporal_data['dSs_est'] = decode_OMP_batch(Rr_trace, 
+									temporal_data['dYy'], obj.Kk)
 	
 	if save_data == True:
-		dump_objects(obj_list, iter_var_idxs, data_flag)
+		
+		# Wait for pending checkpoints (and raise their errors, if any) so
+		# the final dump is not overwritten by an earlier snapshot
+		if checkpoint_interval is not None:
+			executor.shutdown(wait=True)
+			for checkpoint in checkpoints:
+				checkpoint.result()
+		dump_objects(temporal_data, iter_var_idxs, data_flag)
 	
-	return obj_list
+	return temporal_data
 	
 	
 if __name__ == '__main__':
@@ -12,7 +12,7 @@ To view a copy of this license,
 visit http://creativecommons.org/licenses/by-nc-sa/4.0/.
 """
 
-import scipy as sp
+import numpy as np
 import sys
 import copy
 sys.path.append('../src')
@@ -22,6 +22,8 @@ from save_data import dump_objects
 from load_specs import read_specs_file, compile_all_run_vars
 
 
+TEMPORAL_STRUCTS_TO_SAVE = ['entropy']
+
 def temporal_entropy_run(data_flag, iter_var_idxs, 
 					mu_dSs_offset=0, mu_dSs_multiplier=1./3., 
 					sigma_dSs_offset=0, sigma_dSs_multiplier=1./9., 
@@ -43,7 +45,7 @@ def temporal_entropy_run(data_flag, iter_var_idxs,
 	# Set the temporal signal array from file; truncate to signal window
 	obj.set_signal_trace()
 	
-	assert sp.sum(obj.signal_trace <= 0) == 0, \
+	assert np.sum(obj.signal_trace <= 0) == 0, \
 		"Signal contains negative values; increase signal_trace_offset"
 	if signal_window is not None:
 		obj.signal_trace_Tt = obj.signal_trace_Tt[signal_window[0]: \
@@ -64,32 +66,43 @@ def temporal_entropy_run(data_flag, iter_var_idxs,
 			print('Need to assign signal_trace_2 if setting Kk_split or ' \
 					'Kk_1 and Kk_2 nonzero') 
 			quit()
-		assert sp.sum(obj.signal_trace_2 <= 0) == 0, \
+		assert np.sum(obj.signal_trace_2 <= 0) == 0, \
 				"Signal_2 contains neg values; increase signal_trace_offset_2"
 		if signal_window is not None:
 			obj.signal_trace_2 = obj.signal_trace_2[signal_window[0]: \
 													signal_window[1]]
 	
-	obj_list = []
+	# Estimation dSs values over the full signal trace(s)
+	mu_dSs_trace = mu_dSs_offset + obj.signal_trace*mu_dSs_multiplier
+	sigma_dSs_trace = sigma_dSs_offset + obj.signal_trace*sigma_dSs_multiplier
+	dual_odor = (obj.Kk_split is not None) and (obj.Kk_split != 0)
+	if dual_odor == True:
+		mu_dSs_2_trace = mu_dSs_offset + obj.signal_trace_2*mu_dSs_multiplier
+		sigma_dSs_2_trace = sigma_dSs_offset + \
+							obj.signal_trace_2*sigma_dSs_multiplier
+	
+	# Per-timestep outputs are stored in preallocated (nT, ...) arrays rather
+	# than deep copies of the full object at each timestep.
+	nT = len(obj.signal_trace_Tt)
+	temporal_data = dict()
 	
 	for iT, dt in enumerate(obj.signal_trace_Tt):
-		print('%s/%s' % (iT + 1, len(obj.signal_trace)), end=' ')
-		sys.stdout.flush()
+		if iT % 100 == 0:
+			print('%s/%s' % (iT + 1, len(obj.signal_trace)), end=' ')
+			sys.stdout.flush()
 		
 		# Set mu_Ss0 from signal trace, if desired
 		if obj.set_mu_Ss0_temporal_signal == True:
 			obj.mu_Ss0 = obj.signal_trace[iT]
 		
 		# Set estimation dSs values from signal trace and kwargs
-		signal = obj.signal_trace[iT]
-		obj.mu_dSs = mu_dSs_offset + signal*mu_dSs_multiplier
-		obj.sigma_dSs = sigma_dSs_offset + signal*sigma_dSs_multiplier
+		obj.mu_dSs = mu_dSs_trace[iT]
+		obj.sigma_dSs = sigma_dSs_trace[iT]
 		
 		# Set estimation dSs values for dual odor if needed
-		if (obj.Kk_split is not None) and (obj.Kk_split != 0):
-			signal_2 = obj.signal_trace_2[iT]
-			obj.mu_dSs_2 = mu_dSs_offset + signal_2*mu_dSs_multiplier
-			obj.sigma_dSs_2 = sigma_dSs_offset + signal_2*sigma_dSs_multiplier
+		if dual_odor == True:
+			obj.mu_dSs_2 = mu_dSs_2_trace[iT]
+			obj.sigma_dSs_2 = sigma_dSs_2_trace[iT]
 		
 		# Set the full signal array from the above signal parameters
 		obj.set_ordered_dual_signal_array()
@@ -110,15 +123,24 @@ def temporal_entropy_run(data_flag, iter_var_idxs,
 		obj.set_ordered_dual_response_pdf()
 		obj.calc_MI_fore_only()
 		
-		print (sp.mean(obj.entropy))
+		if iT % 100 == 0:
+			print (np.mean(obj.entropy))
+		
+		# Keep full object at time 0 (holds all non-temporal data); allocate
+		# arrays for the temporal structures from their shapes at time 0.
+		if iT == 0:
+			temporal_data['init_obj'] = copy.deepcopy(obj)
+			for struct_name in TEMPORAL_STRUCTS_TO_SAVE:
+				struct_shape = (nT, ) + np.shape(getattr(obj, struct_name))
+				temporal_data[struct_name] = np.zeros(struct_shape)
 		
-		# Deep copy to take all aspects of the object but not update it
-		obj_list.append(copy.deepcopy(obj))
+		for struct_name in TEMPORAL_STRUCTS_TO_SAVE:
+			temporal_data[struct_name][iT] = getattr(obj, struct_name)
 	
 	if save_data == True:
-		dump_objects(obj_list, iter_var_idxs, data_flag)
+		dump_objects(temporal_data, iter_var_idxs, data_flag)
 	
-	return obj_list
+	return temporal_data
 	
 	
 if __name__ == '__main__':
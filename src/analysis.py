@@ -9,7 +9,7 @@ To view a copy of this license,
 visit http://creativecommons.org/licenses/by-nc-sa/4.0/.
 """
 
-import scipy as sp
+import numpy as np
 
 def binary_errors(CS_object, nonzero_bounds=[0.7, 1.3], zero_bound=1./25):
 
@@ -17,22 +17,22 @@ def binary_errors(CS_object, nonzero_bounds=[0.7, 1.3], zero_bound=1./25):
 	mu_dSs = CS_object.mu_dSs
 	sparse_idxs =  CS_object.idxs[0]
 
-	errors_nonzero = 0
-	errors_zero = 0
+	# Masks of nonzero and zero components
+	nonzero_mask = np.zeros(Nn, dtype=bool)
+	nonzero_mask[sparse_idxs] = True
+	zero_mask = ~nonzero_mask
 	
-	for iN in range(Nn):
-		if iN in sparse_idxs: 
-			scaled_estimate = 1.*CS_object.dSs_est[iN]/CS_object.dSs[iN]
-			if nonzero_bounds[0] < scaled_estimate < nonzero_bounds[1]:
-				errors_nonzero += 1
-		else:
-			if abs(CS_object.dSs_est[iN]) <  abs(mu_dSs*zero_bound):
-				errors_zero += 1
+	scaled_estimate = 1.*CS_object.dSs_est[nonzero_mask]/\
+						CS_object.dSs[nonzero_mask]
+	errors_nonzero = np.sum((nonzero_bounds[0] < scaled_estimate)*\
+							(scaled_estimate < nonzero_bounds[1]))
+	errors_zero = np.sum(np.absolute(CS_object.dSs_est[zero_mask]) < 
+							abs(mu_dSs*zero_bound))
 
 	errors = dict()
-	errors['errors_nonzero'] = sp.around(1.*errors_nonzero/ \
+	errors['errors_nonzero'] = np.around(1.*errors_nonzero/ \
 											len(sparse_idxs)*100., 2)
-	errors['errors_zero'] = sp.around(1.*errors_zero/ \
+	errors['errors_zero'] = np.around(1.*errors_zero/ \
 											(Nn - len(sparse_idxs))*100., 2)
 										
 	return errors
@@ -44,16 +44,9 @@ def binary_errors_temporal_run(init_CS_object, dSs, dSs_est, mu_dSs,
 	# Last index is the actual stimulus vector; first index is timepoint
 	Nn = init_CS_object.Nn
 	sparse_idxs =  init_CS_object.idxs[0]
-	if dual == True:
-		idxs_2 = init_CS_object.idxs_2
-		idxs_1 = []
-		for idx in sparse_idxs:
-			if idx not in idxs_2:
-				idxs_1.append(idx)
-	
-	nT = dSs.shape[0]
 	
 	# Check dimension of the stimuli
+	nT = dSs.shape[0]
 	assert len(dSs.shape) == 2, "Need to pass rank-2 tensor for dSs; first "\
 								"index is time, second is Nn"
 	assert len(dSs_est.shape) == 2, "Need to pass rank-2 tensor for dSs_est; "\
@@ -61,28 +54,29 @@ def binary_errors_temporal_run(init_CS_object, dSs, dSs_est, mu_dSs,
 	assert len(mu_dSs.shape) == 1, "Need to pass 1-rank array for mu_dSs"
 	assert len(mu_dSs) == nT, "mu_dSs must be length nT=%s" % nT
 	
-	errors_nonzero = sp.zeros(nT)
-	errors_zero = sp.zeros(nT)
+	# Masks of nonzero and zero components; for dual odors, only the 
+	# components of odor 1 are counted as nonzero
+	nonzero_mask = np.zeros(Nn, dtype=bool)
+	nonzero_mask[sparse_idxs] = True
+	zero_mask = ~nonzero_mask
+	if dual == True:
+		nonzero_mask[init_CS_object.idxs_2] = False
+	
+	# All timepoints at once; rows are time, columns are components
+	scaled_estimate = 1.*dSs_est[:, nonzero_mask]/dSs[:, nonzero_mask]
+	errors_nonzero = np.sum((nonzero_bounds[0] < scaled_estimate)*\
+							(scaled_estimate < nonzero_bounds[1]), axis=1)
+	errors_zero = np.sum(np.absolute(dSs_est[:, zero_mask]).T < 
+							abs(mu_dSs*zero_bound), axis=0)
 	
-	for iN in range(Nn):
-		if iN in sparse_idxs: 
-			if (dual == True) and (iN in idxs_2):
-				continue
-			scaled_estimate = 1.*dSs_est[:, iN]/dSs[:, iN]
-			errors_nonzero += (nonzero_bounds[0] < scaled_estimate)*\
-								(scaled_estimate < nonzero_bounds[1])
-		else:
-			zero_est = (sp.absolute(dSs_est[:, iN]) < abs(mu_dSs*zero_bound))
-			errors_zero += zero_est
-
 	errors = dict()
 	if dual == True:
-		errors['errors_nonzero'] = sp.around(1.*errors_nonzero/ \
-								len(idxs_1)*100., 2)
+		errors['errors_nonzero'] = np.around(1.*errors_nonzero/ \
+								np.sum(nonzero_mask)*100., 2)
 	else:
-		errors['errors_nonzero'] = sp.around(1.*errors_nonzero/ \
+		errors['errors_nonzero'] = np.around(1.*errors_nonzero/ \
 								len(sparse_idxs)*100., 2)
-	errors['errors_zero'] = sp.around(1.*errors_zero/ \
+	errors['errors_zero'] = np.around(1.*errors_zero/ \
 							(Nn - len(sparse_idxs))*100., 2)
 										
 	return errors
@@ -124,44 +118,44 @@ def binary_errors_dual_odor(CS_object, nonzero_bounds=[0.7, 1.3],
 	sparse_idxs =  CS_object.idxs[0]
 	idxs_2 =  CS_object.idxs_2
 	
-	errors_nonzero = 0
-	errors_nonzero_2 = 0
-	errors_zero = 0
-	errors_zero_2 = 0
+	# Masks of odor 1, odor 2, and zero components
+	nonzero_mask = np.zeros(Nn, dtype=bool)
+	nonzero_mask[sparse_idxs] = True
+	nonzero_mask_2 = np.zeros(Nn, dtype=bool)
+	nonzero_mask_2[np.asarray(idxs_2, dtype=int)] = True
+	zero_mask = ~nonzero_mask
 	
-	for iN in range(Nn):
-		if iN in sparse_idxs: 
-			if iN in idxs_2:
-				scaled_estimate = 1.*CS_object.dSs_est[iN]/CS_object.dSs[iN]
-				if nonzero_bounds[0] < scaled_estimate < nonzero_bounds[1]:
-					errors_nonzero_2 += 1
-			else:
-				scaled_estimate = 1.*CS_object.dSs_est[iN]/CS_object.dSs[iN]
-				if nonzero_bounds[0] < scaled_estimate < nonzero_bounds[1]:
-					errors_nonzero += 1
-		else:
-			if abs(CS_object.dSs_est[iN]) <  abs(mu_dSs*zero_bound):
-				errors_zero += 1
-			if CS_object.Kk_split != 0:
-				if abs(CS_object.dSs_est[iN]) <  abs(mu_dSs_2*zero_bound):
-					errors_zero_2 += 1
+	scaled_estimate = 1.*CS_object.dSs_est[nonzero_mask]/\
+						CS_object.dSs[nonzero_mask]
+	in_bounds = (nonzero_bounds[0] < scaled_estimate)*\
+				(scaled_estimate < nonzero_bounds[1])
+	is_odor_2 = nonzero_mask_2[nonzero_mask]
+	errors_nonzero = np.sum(in_bounds & ~is_odor_2)
+	errors_nonzero_2 = np.sum(in_bounds & is_odor_2)
+	
+	abs_zero_est = np.absolute(CS_object.dSs_est[zero_mask])
+	errors_zero = np.sum(abs_zero_est < abs(mu_dSs*zero_bound))
+	if CS_object.Kk_split != 0:
+		errors_zero_2 = np.sum(abs_zero_est < abs(mu_dSs_2*zero_bound))
+	else:
+		errors_zero_2 = 0
 			
 	errors = dict()
 	
 	# Save errors; special cases if split is 0 or full
-	if set(idxs_2) == set(sparse_idxs):
+	if np.array_equal(nonzero_mask_2, nonzero_mask):
 		errors['errors_nonzero'] = 0
 	else:
 		errors['errors_nonzero'] = \
-			sp.around(1.*errors_nonzero/(len(sparse_idxs) - len(idxs_2))*100, 2)
+			np.around(1.*errors_nonzero/(len(sparse_idxs) - len(idxs_2))*100, 2)
 	if len(idxs_2) == 0:
 		errors['errors_nonzero_2'] = 0
 	else:
 		errors['errors_nonzero_2'] = \
-			sp.around(1.*errors_nonzero_2/len(idxs_2)*100., 2)
+			np.around(1.*errors_nonzero_2/len(idxs_2)*100., 2)
 	errors['errors_zero'] = \
-		sp.around(1.*errors_zero/(Nn - len(sparse_idxs))*100., 2)
+		np.around(1.*errors_zero/(Nn - len(sparse_idxs))*100., 2)
 	errors['errors_zero_2'] = \
-		sp.around(1.*errors_zero_2/(Nn - len(sparse_idxs))*100., 2)
+		np.around(1.*errors_zero_2/(Nn - len(sparse_idxs))*100., 2)
 										
 	return errors
\ No newline at end of file
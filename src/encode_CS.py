@@ -10,6 +10,9 @@ To view a copy of this license,
 visit http://creativecommons.org/licenses/by-nc-sa/4.0/.
 """
 
+import multiprocessing
+from four_state_receptor_CS import four_state_receptor_CS
+
 
 def single_encode_CS(obj, run_specs=dict()):
 	"""
@@ -25,29 +28,69 @@ def single_encode_CS(obj, run_specs=dict()):
 		obj: now with variables updated via encoding.
 	"""		
 	
-	if 'run_type' in list(run_specs.keys()):
+	if 'run_type' in run_specs:
 		val = run_specs['run_type']
 		if val[0] == 'normal_activity_fixed_Kk2':
 			override_parameters = dict()
 			override_parameters['mu_Ss0'] = float(val[1])
 			override_parameters['mu_eps'] = float(val[2])
-			obj.encode_normal_activity(**override_parameters)
+			obj.encode('normal_activity', **override_parameters)
 		elif val[0] == 'uniform_activity_fixed_Kk2':
 			override_parameters = dict()
 			override_parameters['mu_Ss0'] = float(val[1])
 			override_parameters['mu_eps'] = float(val[2])
-			obj.encode_uniform_activity(**override_parameters)		
+			obj.encode('uniform_activity', **override_parameters)
+		elif val[0] in obj._PIPELINES:
+			obj.encode(val[0])
 		else:
 			try: 
-				hasattr(obj, 'encode_%s' % val[0]) and \
-				callable(getattr(obj, 'encode_%s' % val[0]))
+				encode_func = getattr(obj, 'encode_%s' % val[0])
 			except AttributeError:
-				print(('Run specification %s not recognized' % val[0]))
+				print('Run specification %s not recognized' % val[0])
 				quit()
-			str = 'obj.encode_%s()' % val[0]
-			exec(str)
+			encode_func()
 	else:
 		print ('No run type specified, proceeding with normal_activity')
-		obj.encode_normal_activity()
+		obj.encode('normal_activity')
+	
+	return obj
+
+def _encode_params(args):
+	"""
+	Construct and encode a single object; worker for batch_encode_CS.
+	"""
+	
+	params, run_specs = args
+	obj = four_state_receptor_CS(**params)
+	
+	return single_encode_CS(obj, run_specs)
+
+def batch_encode_CS(params_list, run_specs=dict(), num_processes=None):
+	"""
+	Run CS encoding for a list of parameter sets in parallel processes. 
+	Each encoding is seeded by its own parameters, so the objects are 
+	the same as when encoded serially. Consecutive parameter sets are 
+	sent to the same process, where signals and free energies shared 
+	between them are memoized.
+	
+	Args:
+		params_list: list of dictionaries; keyword arguments of the 
+			four_state_receptor_CS object for each encoding.
+		run_specs: dictionary; parameters of the run, as in 
+			single_encode_CS, shared by all encodings.
+		num_processes: int; number of worker processes. Defaults to 
+			the number of CPUs.
+		
+	Returns:
+		obj_list: list of encoded objects, ordered as params_list.
+	"""
+	
+	tasks = [(params, run_specs) for params in params_list]
+	pool = multiprocessing.Pool(num_processes)
+	try:
+		obj_list = pool.map(_encode_params, tasks)
+	finally:
+		pool.close()
+		pool.join()
 	
-	return obj
\ No newline at end of file
+	return obj_list
@@ -10,17 +10,17 @@ To view a copy of this license,
 visit http://creativecommons.org/licenses/by-nc-sa/4.0/.
 """
 
-import scipy as sp
+import numpy as np
 from four_state_receptor_CS import four_state_receptor_CS
 from kinetics import receptor_activity, free_energy
 from utils import scramble, normal_pdf
 from lin_alg_structs import random_matrix
 
 
-INT_PARAMS = ['Nn', 'Kk', 'Mm', 'seed_Ss0', 'seed_dSs', 'seed_Kk1', 
-				'seed_Kk2', 'seed_receptor_activity', 'Kk_split', 
+INT_PARAMS = frozenset(['Nn', 'Kk', 'Mm', 'seed_Ss0', 'seed_dSs', 
+				'seed_Kk1', 'seed_Kk2', 'seed_receptor_activity', 'Kk_split', 
 				'Kk_1', 'Kk_2', 'num_signals', 'num_fore_signals', 
-				'num_back_signals']
+				'num_back_signals'])
 
 class response_entropy(four_state_receptor_CS):
 	"""
@@ -53,9 +53,11 @@ class response_entropy(four_state_receptor_CS):
 		# Overwrite variables with passed arguments	
 		for key in kwargs:
 			if key in INT_PARAMS:
-				exec ('self.%s = int(kwargs[key])' % key)
+				setattr(self, key, int(kwargs[key]))
 			else:
-				exec ('self.%s = kwargs[key]' % key)
+				setattr(self, key, kwargs[key])
+		
+		self._matrix_shape = (self.Mm, self.Nn)
 		
 		
 	def set_signal_array(self):
@@ -64,7 +66,7 @@ class response_entropy(four_state_receptor_CS):
 		"""
 		
 		self.set_sparse_signals()
-		self.Ss = sp.tile(self.Ss, reps=(self.num_signals, 1))
+		self.Ss = np.tile(self.Ss, reps=(self.num_signals, 1))
 		self.Ss = scramble(self.Ss).T
 		
 	def set_mean_response_array(self):
@@ -75,7 +77,7 @@ class response_entropy(four_state_receptor_CS):
 		self.Yy = receptor_activity(self.Ss, self.Kk1, 
 									self.Kk2, self.eps)
 		self.Yy *= self.NL_scale*(self.Yy > self.NL_threshold)
-		self.Yy = sp.minimum(self.Yy, self.firing_max)
+		self.Yy = np.minimum(self.Yy, self.firing_max)
 		
 	def set_ordered_dual_signal_array(self):
 		"""
@@ -89,8 +91,8 @@ class response_entropy(four_state_receptor_CS):
 		tmp_Kk_1 = self.Kk_1
 		self.Kk_1 = 0
 		self.set_sparse_signals()
-		self.Ss = sp.tile(self.Ss, reps=(self.num_fore_signals, 1))
-		sp.random.seed(self.seed_dSs_1)
+		self.Ss = np.tile(self.Ss, reps=(self.num_fore_signals, 1))
+		np.random.seed(self.seed_dSs_1)
 		self.Ss_fore = scramble(self.Ss).T
 		self.Kk_1 = tmp_Kk_1
 		
@@ -98,13 +100,13 @@ class response_entropy(four_state_receptor_CS):
 		tmp_Kk_2 = self.Kk_2 
 		self.Kk_2 = 0
 		self.set_sparse_signals()
-		self.Ss = sp.tile(self.Ss, reps=(self.num_back_signals, 1))
-		sp.random.seed(self.seed_dSs_2)
+		self.Ss = np.tile(self.Ss, reps=(self.num_back_signals, 1))
+		np.random.seed(self.seed_dSs_2)
 		self.Ss_back = scramble(self.Ss).T
 		self.Kk_2 = tmp_Kk_2
 		
 		# Tile such that outer loop is foreground; inner is background
-		self.Ss = sp.zeros((self.Nn, self.num_back_signals*
+		self.Ss = np.zeros((self.Nn, self.num_back_signals*
 							self.num_fore_signals))
 		for iS in range(self.num_fore_signals):
 			idx_beg = self.num_back_signals*iS
@@ -113,7 +115,7 @@ class response_entropy(four_state_receptor_CS):
 										   self.Ss_back.T).T
 		
 		# Get range of concentrations; foreground and background scaled same
-		self.Ss *= 10.**sp.random.uniform(self.entropy_conc_min, 
+		self.Ss *= 10.**np.random.uniform(self.entropy_conc_min, 
 						self.entropy_conc_max, self.Ss.shape[1])
 		
 		
@@ -122,45 +124,57 @@ class response_entropy(four_state_receptor_CS):
 		Get the pdf p(r) using the mean responses and signal noise.
 		"""
 		
-		self.Yy_bins = sp.arange(-0.01, self.NL_scale, self.entropy_pdf_dy)
-		self.pdf_r_s = sp.zeros((self.num_fore_signals, 
+		self.Yy_bins = np.arange(-0.01, self.NL_scale, self.entropy_pdf_dy)
+		self.pdf_r_s = np.zeros((self.num_fore_signals, 
 								len(self.Yy_bins) - 1, self.Mm))
 								
 		# Add noise for entropy calc
-		self.Yy += sp.random.normal(0, self.NL_scale*self.meas_noise, 
+		self.Yy += np.random.normal(0, self.NL_scale*self.meas_noise, 
 									self.Yy.shape)
 		
-		for iS in range(self.num_fore_signals):
-			for iM in range(self.Mm):
-				idx_beg = self.num_back_signals*iS
-				idx_end = idx_beg + self.num_back_signals
-				hist, _ = sp.histogram(self.Yy[iM, idx_beg:idx_end], 
-									   bins=self.Yy_bins, normed=True)
-				self.pdf_r_s[iS, :, iM] = hist
+		# Bin all responses at once rather than one histogram per foreground
+		# signal and receptor. As in histogram, the last bin includes its 
+		# right edge and responses outside the bins are not counted.
+		num_bins = len(self.Yy_bins) - 1
+		bin_idxs = np.searchsorted(self.Yy_bins, self.Yy, side='right') - 1
+		bin_idxs[self.Yy == self.Yy_bins[-1]] = num_bins - 1
+		in_range = (bin_idxs >= 0)*(bin_idxs < num_bins)
+		
+		# Columns of Yy are ordered with foreground as the outer loop
+		fore_idxs = np.arange(self.Yy.shape[1])//self.num_back_signals
+		flat_idxs = (fore_idxs*self.Mm + np.arange(self.Mm)[:, None])*\
+						num_bins + bin_idxs
+		counts = np.bincount(flat_idxs[in_range], 
+					minlength=self.num_fore_signals*self.Mm*num_bins)
+		counts = np.reshape(counts, (self.num_fore_signals, self.Mm, num_bins))
+		
+		# Normalize each histogram to a density over the bins
+		hist = counts/np.diff(self.Yy_bins)/np.sum(counts, axis=-1)[..., None]
+		self.pdf_r_s[:] = np.swapaxes(hist, 1, 2)
 		
 	def set_response_pdf(self):
 		"""
 		Get the pdf p(r) using the mean responses and signal noise.
 		"""
 		
-		self.response_mesh = sp.arange(0, self.NL_scale, 
+		self.response_mesh = np.arange(0, self.NL_scale, 
 										self.entropy_pdf_dy)
-		self.pdf_r_s = sp.zeros((len(self.response_mesh), self.Mm))
-		tiled_mesh = sp.tile(self.response_mesh, reps=(self.num_signals, 1))
+		self.pdf_r_s = np.zeros((len(self.response_mesh), self.Mm))
+		tiled_mesh = np.tile(self.response_mesh, reps=(self.num_signals, 1))
 		for iM in range(self.Mm):
 			pdf_all_signals = normal_pdf(tiled_mesh.T, means=self.Yy[iM, :],
 								sigmas=self.NL_scale*self.meas_noise).T
-			self.pdf_r_s[:, iM] = sp.average(pdf_all_signals, axis=0)
+			self.pdf_r_s[:, iM] = np.average(pdf_all_signals, axis=0)
 			
 	def calc_MI(self):
 		"""
 		Calculate the mutual information between signal and response.
 		"""
 		
-		cond_H = -sp.nansum(self.pdf_r_s*sp.log(self.pdf_r_s), 
+		cond_H = -np.nansum(self.pdf_r_s*np.log(self.pdf_r_s), 
 					axis=0)*self.entropy_pdf_dy
-		noise_H = (1 + sp.log(2*sp.pi*(self.NL_scale*self.meas_noise)**2))/2
-		self.entropy = (cond_H - noise_H)/sp.log(2)
+		noise_H = (1 + np.log(2*np.pi*(self.NL_scale*self.meas_noise)**2))/2
+		self.entropy = (cond_H - noise_H)/np.log(2)
 		
 	def calc_MI_fore_only(self):
 		"""
@@ -171,10 +185,10 @@ class response_entropy(four_state_receptor_CS):
 		ds = 1./self.num_fore_signals
 		dr = self.entropy_pdf_dy
 		
-		pdf_r = ds*sp.sum(self.pdf_r_s, axis=0)
-		noise_H = -dr*ds*sp.nansum(sp.log(self.pdf_r_s)/
-								sp.log(2)*self.pdf_r_s, axis=(0, 1))
-		response_H = -dr*sp.nansum(sp.log(pdf_r + 1e-9)/sp.log(2)*pdf_r, axis=0)
+		pdf_r = ds*np.sum(self.pdf_r_s, axis=0)
+		noise_H = -dr*ds*np.nansum(np.log(self.pdf_r_s)/
+								np.log(2)*self.pdf_r_s, axis=(0, 1))
+		response_H = -dr*np.nansum(np.log(pdf_r + 1e-9)/np.log(2)*pdf_r, axis=0)
 		self.entropy = response_H - noise_H
 				
 	def encode_entropy_calc(self):
@@ -218,10 +232,10 @@ class response_entropy(four_state_receptor_CS):
 		tmp_seed_Ss0 = self.seed_Ss0
 		self.mu_dSs = 1e-5
 		self.sigma_dSs = 0
-		sp.random.seed()
-		self.seed_Ss0 = sp.random.randint(1e7)
+		np.random.seed()
+		self.seed_Ss0 = np.random.randint(1e7)
 		self.set_signal_array()
-		self.Ss_bck = sp.zeros(self.Ss.shape)
+		self.Ss_bck = np.zeros(self.Ss.shape)
 		self.Ss_bck[:] = self.Ss
 		
 		# Restore the foreground; set the background to zero
@@ -250,10 +264,10 @@ class response_entropy(four_state_receptor_CS):
 		tmp_seed_Ss0 = self.seed_Ss0
 		self.mu_dSs = 1e-5
 		self.sigma_dSs = 0
-		sp.random.seed()
-		self.seed_Ss0 = sp.random.randint(1e7)
+		np.random.seed()
+		self.seed_Ss0 = np.random.randint(1e7)
 		self.set_signal_array()
-		self.Ss_bck = sp.zeros(self.Ss.shape)
+		self.Ss_bck = np.zeros(self.Ss.shape)
 		self.Ss_bck[:] = self.Ss
 		self.set_adapted_free_energy()
 		
@@ -18,25 +18,275 @@ To view a copy of this license,
 visit http://creativecommons.org/licenses/by-nc-sa/4.0/.
 """
 
-import scipy as sp
-import sys
-sys.path.append('../src')
+import numpy as np
+import functools
 from lin_alg_structs import random_matrix, sparse_vector, \
-							sparse_vector_bkgrnd, manual_sparse_vector
+							sparse_vector_bkgrnd, manual_sparse_vector, \
+							row_mixture_matrix, seeded_uniform_matrices
 from kinetics import linear_gain, receptor_activity, free_energy, \
 						Kk2_samples, Kk2_eval_normal_activity, \
 						Kk2_eval_exponential_activity, \
 						Kk2_eval_uniform_activity, inhibitory_normalization, \
 						inhibitory_normalization_linear_gain, \
-						temporal_kernel
-from optimize import decode_CS, decode_nonlinear_CS
-from utils import clip_array
+						temporal_kernel, activity_and_gain
+from optimize import decode_CS, decode_nonlinear_CS, thresholded_csr, \
+						SPARSE_OPT_TYPES
+from utils import clip_inplace
 from load_data import load_signal_trace_from_file, load_Hallem_firing_rate_data
 
 
-INT_PARAMS = ['Nn', 'Kk', 'Mm', 'seed_Ss0', 'seed_dSs', 'seed_Kk1', 
-				'seed_Kk2', 'seed_receptor_activity', 'Kk_split', 
-				'Kk_1', 'Kk_2', 'seed_dSs_2']
+INT_PARAMS = frozenset(['Nn', 'Kk', 'Mm', 'seed_Ss0', 'seed_dSs', 
+				'seed_Kk1', 'seed_Kk2', 'seed_receptor_activity', 'Kk_split', 
+				'Kk_1', 'Kk_2', 'seed_dSs_2'])
+
+
+def _call_cached(cached_func, *args):
+	"""
+	Call an lru_cache-wrapped function, bypassing the cache if the 
+	arguments are unhashable (e.g. array-valued parameters).
+	"""
+	
+	try:
+		hash(args)
+	except TypeError:
+		return cached_func.__wrapped__(*args)
+	
+	return cached_func(*args)
+
+@functools.lru_cache(maxsize=64)
+def _sparse_signals_cached(Nn, Kk, Kk_1, Kk_split, mu_dSs, sigma_dSs, 
+							mu_dSs_2, sigma_dSs_2, mu_Ss0, sigma_Ss0, 
+							seed_dSs, seed_dSs_2, seed_Ss0):
+	"""
+	Sparse signals for fixed statistics and seeds; body of 
+	set_sparse_signals, cached so that sweeps over other parameters 
+	do not redraw the signals.
+	
+	Returns:
+		dSs, idxs, idxs_2, Ss0, Ss0_noisy: signal structures; the 
+			arrays are read-only since they are shared between calls.
+		Kk_split: Kk_split, set to 0 if there is no second odor.
+		rng_state: global numpy RNG state after the odor 2 draws, to be 
+			restored on each call so downstream draws are unchanged; 
+			None if there is no second odor, since the other draws use 
+			local generators.
+	"""
+	
+	params_dSs = [mu_dSs, sigma_dSs]
+	params_Ss0 = [mu_Ss0, sigma_Ss0]
+	dSs, idxs = sparse_vector([Nn, Kk], params_dSs, seed=seed_dSs)
+	
+	# Replace components with conflicting background odor 
+	if (Kk_split is not None) and (Kk_split != 0):
+		assert 0 <= Kk_split <= Kk, \
+			"Splitting sparse signal into two levels requires Kk_split" \
+			" to be non-negative and less than or equal to Kk."
+		assert mu_dSs_2 is not None and sigma_dSs_2 is not None, \
+			"Splitting sparse signal into two levels requires that" \
+			" mu_dSs_2 and sigma_dSs_2 are set."
+
+		if seed_dSs_2 is None:
+			
+			# Want both odor 1 and odor 2 to be determined by seed_dSs
+			idxs_2 = np.random.RandomState(seed_dSs).choice(idxs[0], 
+											Kk_split, replace=False)
+		else:
+			
+			# Want odor 1 and 2 to be determined by respective seeds.
+			dSs, idxs = sparse_vector([Nn, Kk_1], params_dSs, seed=seed_dSs)
+			_, idxs_2 = sparse_vector([Nn, Kk_split], params_dSs, 
+										seed=seed_dSs_2)
+			
+			# Re-define the full idxs and the odor 2 idxs subset
+			idxs = ((list(idxs[0]) + list(idxs_2[0])), )
+			idxs_2 = idxs_2[0]
+			
+		# random_matrix reseeds with its default seed on each call, so all
+		# odor 2 components share one value; draw it once for all of them
+		dSs[idxs_2] = random_matrix(1, params=[mu_dSs_2, sigma_dSs_2])
+		rng_state = np.random.get_state()
+	else:
+		idxs_2 = []
+		Kk_split = 0
+		rng_state = None
+		
+	# Ss0 is the ideal (learned) background stimulus without noise
+	Ss0, Ss0_noisy = sparse_vector_bkgrnd([Nn, Kk], idxs, params_Ss0, 
+											seed=seed_Ss0)
+	
+	for array in (dSs, Ss0, Ss0_noisy):
+		array.setflags(write=False)
+	
+	return dSs, idxs, idxs_2, Ss0, Ss0_noisy, Kk_split, rng_state
+
+@functools.lru_cache(maxsize=None)
+def _eps_envelope(Mm, width):
+	"""
+	Gaussian envelope of the normal free energy tuning curve over the
+	Mm receptors; read-only, since it is shared between calls.
+	"""
+	
+	# exp(-x**2/(2*width)**2), evaluated in place in one array
+	envelope = np.square(np.arange(Mm, dtype=np.float64))
+	envelope /= -(2.0*width)**2.0
+	np.exp(envelope, out=envelope)
+	envelope.setflags(write=False)
+	
+	return envelope
+
+@functools.lru_cache(maxsize=64)
+def _normal_eps_cached(Mm, mu_eps, normal_eps_tuning_prefactor, 
+						normal_eps_tuning_width, sigma_eps, seed_eps, 
+						WL_scaling, Ss_level, mu_min_eps, sigma_min_eps, 
+						mu_max_eps, sigma_max_eps):
+	"""
+	Free energies with a normal tuning curve, for fixed statistics and 
+	seeds; body of set_normal_free_energy, cached as for the signals.
+	Ss_level is the signal level setting the Weber-law shift.
+	
+	Returns:
+		eps_base, min_eps, max_eps, eps: read-only energy arrays.
+		rng_state: global numpy RNG state after the draws.
+	"""
+	
+	eps_base = mu_eps + normal_eps_tuning_prefactor* \
+				_eps_envelope(Mm, normal_eps_tuning_width)
+	eps_base += random_matrix(Mm, params=[0, sigma_eps], seed=seed_eps)
+	eps = WL_scaling*np.log(Ss_level) + eps_base
+	
+	# Apply max and min epsilon value to each component
+	min_eps = random_matrix(Mm, params=[mu_min_eps, sigma_min_eps], 
+							seed=seed_eps)
+	max_eps = random_matrix(Mm, params=[mu_max_eps, sigma_max_eps], 
+							seed=seed_eps)
+	eps = np.maximum(eps, min_eps)
+	eps = np.minimum(eps, max_eps)
+	
+	for array in (eps_base, min_eps, max_eps, eps):
+		array.setflags(write=False)
+	
+	return eps_base, min_eps, max_eps, eps, np.random.get_state()
+
+
+@functools.lru_cache(maxsize=16)
+def _normal_Kk_cached(matrix_shape, mu_Kk1_hyper_lo, mu_Kk1_hyper_hi, 
+						sigma_Kk1_hyper_lo, sigma_Kk1_hyper_hi, 
+						mu_Kk2_hyper_lo, mu_Kk2_hyper_hi, sigma_Kk2_hyper_lo, 
+						sigma_Kk2_hyper_hi, seed_Kk1, seed_Kk2, clip, dtype):
+	"""
+	Binding constants with row-wise normal statistics, for fixed 
+	hyperparameters and seeds; body of set_normal_Kk, cached so that 
+	sweeps over signal parameters do not redraw the Mm x Nn matrices.
+	
+	Returns:
+		Kk1, Kk2: read-only binding constant arrays, of type dtype.
+		rng_state: global numpy RNG state after the draws.
+	"""
+	
+	Mm = matrix_shape[0]
+	Kk1_mus, Kk1_sigmas = seeded_uniform_matrices([Mm], 
+							[[mu_Kk1_hyper_lo, mu_Kk1_hyper_hi], 
+							[sigma_Kk1_hyper_lo, sigma_Kk1_hyper_hi]], 
+							seed=seed_Kk1)
+	Kk2_mus, Kk2_sigmas = seeded_uniform_matrices([Mm], 
+							[[mu_Kk2_hyper_lo, mu_Kk2_hyper_hi], 
+							[sigma_Kk2_hyper_lo, sigma_Kk2_hyper_hi]], 
+							seed=seed_Kk2)
+	
+	Kk1 = random_matrix(matrix_shape, [Kk1_mus, Kk1_sigmas], 
+						sample_type='rank2_row_gaussian', seed=seed_Kk1, 
+						dtype=dtype)
+	Kk2 = random_matrix(matrix_shape, [Kk2_mus, Kk2_sigmas],
+						sample_type='rank2_row_gaussian', seed=seed_Kk2, 
+						dtype=dtype)
+	
+	if clip == True:
+		clip_inplace(Kk1, 'Kk1')
+		clip_inplace(Kk2, 'Kk2')
+	
+	for array in (Kk1, Kk2):
+		array.setflags(write=False)
+	
+	return Kk1, Kk2, np.random.get_state()
+
+@functools.lru_cache(maxsize=16)
+def _mixture_Kk_cached(matrix_shape, Kk1_p, mu_Kk1_1, sigma_Kk1_1, mu_Kk1_2, 
+						sigma_Kk1_2, Kk2_p, mu_Kk2_1, sigma_Kk2_1, mu_Kk2_2, 
+						sigma_Kk2_2, seed_Kk1, seed_Kk2, clip, dtype):
+	"""
+	Binding constants with Gaussian mixture rows, for fixed statistics
+	and seeds; body of set_mixture_Kk, cached as for set_normal_Kk.
+	
+	Returns:
+		Kk1, Kk2: read-only binding constant arrays, of type dtype.
+		rng_state: global numpy RNG state after the draws.
+	"""
+	
+	Mm = matrix_shape[0]
+	num_comp1 = int(Kk1_p*Mm)
+	Kk1 = row_mixture_matrix(matrix_shape, num_comp1, 
+								[mu_Kk1_1, sigma_Kk1_1], 
+								[mu_Kk1_2, sigma_Kk1_2], 
+								seed=seed_Kk1).astype(dtype, copy=False)
+	
+	num_comp1 = int(Kk2_p*Mm)
+	Kk2 = row_mixture_matrix(matrix_shape, num_comp1, 
+								[mu_Kk2_1, sigma_Kk2_1], 
+								[mu_Kk2_2, sigma_Kk2_2], 
+								seed=seed_Kk2).astype(dtype, copy=False)
+	
+	if clip == True:
+		clip_inplace(Kk1, 'Kk1')
+		clip_inplace(Kk2, 'Kk2')
+	
+	for array in (Kk1, Kk2):
+		array.setflags(write=False)
+	
+	return Kk1, Kk2, np.random.get_state()
+
+@functools.lru_cache(maxsize=16)
+def _Kk2_normal_activity_cached(matrix_shape, mu_Kk1, sigma_Kk1, 
+								receptor_tuning_mu_hyper_mu, 
+								receptor_tuning_mu_hyper_sigma, 
+								receptor_tuning_sigma_hyper_lo, 
+								receptor_tuning_sigma_hyper_hi, mu_Ss0, 
+								mu_eps, seed_Kk1, seed_Kk2, 
+								seed_receptor_activity, clip, dtype):
+	"""
+	Binding constants for normal receptor activity distributions, for 
+	fixed statistics and seeds; body of set_Kk2_normal_activity, cached 
+	as for set_normal_Kk.
+	
+	Returns:
+		Kk1, Kk2: read-only binding constant arrays, of type dtype.
+		rng_state: global numpy RNG state after the draws.
+	"""
+	
+	Kk1 = random_matrix(matrix_shape, [mu_Kk1, sigma_Kk1], seed=seed_Kk1, 
+						dtype=dtype)
+	
+	Mm = matrix_shape[0]
+	mu_stats = [receptor_tuning_mu_hyper_mu, receptor_tuning_mu_hyper_sigma]
+	sigma_stats = [receptor_tuning_sigma_hyper_lo, 
+					receptor_tuning_sigma_hyper_hi]
+	activity_mus = random_matrix([Mm], params=mu_stats, sample_type='normal',
+									seed=seed_receptor_activity)
+	activity_sigmas = random_matrix([Mm], params=sigma_stats, 
+									sample_type='uniform',
+									seed=seed_receptor_activity)
+	
+	Kk2 = Kk2_eval_normal_activity(matrix_shape, activity_mus, 
+									activity_sigmas, mu_Ss0, mu_eps, 
+									seed_Kk2).astype(dtype, copy=False)
+	
+	if clip == True:
+		clip_inplace(Kk1, 'Kk1')
+		clip_inplace(Kk2, 'Kk2')
+	
+	for array in (Kk1, Kk2):
+		array.setflags(write=False)
+	
+	return Kk1, Kk2, np.random.get_state()
 
 
 class four_state_receptor_CS(object):	
@@ -44,6 +294,48 @@ class four_state_receptor_CS(object):
 	Object for encoding and decoding a four-state receptor model 
 	using compressed sensing
 	"""
+	
+	# Sequence of set_* methods run by encode(kind); the encode_* methods
+	# are named after these kinds. Only the steps in _KWARG_STEPS receive
+	# the keyword arguments passed to encode.
+	_PIPELINES = {
+		'normal_activity': ('set_sparse_signals', 'set_normal_free_energy', 
+			'set_Kk2_normal_activity', 'set_measured_activity', 
+			'set_linearized_response'),
+		'uniform_activity': ('set_sparse_signals', 'set_normal_free_energy', 
+			'set_Kk2_uniform_activity', 'set_measured_activity', 
+			'set_linearized_response'),
+		'normal_activity_mixture': ('set_sparse_signals', 
+			'set_normal_free_energy', 'set_Kk2_normal_activity_mixture', 
+			'set_measured_activity', 'set_linearized_response'),
+		'normal_Kk': ('set_sparse_signals', 'set_normal_free_energy', 
+			'set_normal_Kk', 'set_measured_activity', 
+			'set_linearized_response'),
+		'uniform_Kk': ('set_sparse_signals', 'set_normal_free_energy', 
+			'set_uniform_Kk', 'set_measured_activity', 
+			'set_linearized_response'),
+		'mixture_Kk': ('set_sparse_signals', 'set_normal_free_energy', 
+			'set_mixture_Kk', 'set_measured_activity', 
+			'set_linearized_response'),
+		'adapted_normal_activity': ('set_sparse_signals', 'set_normal_Kk', 
+			'set_adapted_free_energy', 'set_measured_activity', 
+			'set_linearized_response'),
+		'manual_signal_normal_Kk': ('set_manual_signals', 'set_normal_Kk', 
+			'set_normal_free_energy', 'set_measured_activity', 
+			'set_linearized_response'),
+		'manual_signal_uniform_Kk': ('set_manual_signals', 'set_uniform_Kk', 
+			'set_normal_free_energy', 'set_measured_activity', 
+			'set_linearized_response'),
+		'power_Kk': ('set_sparse_signals', 'set_power_Kk', 
+			'set_normal_free_energy', 'set_measured_activity', 
+			'set_linearized_response'),
+		'power_Kk_adapted': ('set_sparse_signals', 'set_power_Kk', 
+			'set_adapted_free_energy', 'set_measured_activity', 
+			'set_linearized_response'),
+		}
+	_KWARG_STEPS = frozenset(['set_Kk2_normal_activity', 
+							'set_Kk2_uniform_activity', 
+							'set_Kk2_normal_activity_mixture'])
 
 	def __init__(self, **kwargs):
 	
@@ -53,9 +345,11 @@ class four_state_receptor_CS(object):
 		self.Ss0 = None
 		self.dSs = None
 		self.Ss = None
+		self.Ss_idxs = None
 		self.Yy0 = None
 		self.dYy = None
 		self.Yy = None
+		self.Rr = None
 		self.eps = None
 		
 		# Set system parameters; Kk_split (or Kk_1/Kk_2) for two-level signals
@@ -207,6 +501,25 @@ class four_state_receptor_CS(object):
 		# Added to receptor activity before decoding
 		self.meas_noise = 1e-3
 		
+		# CS decoding method; decode_opt_type is "L1_strong", "L1_LP", 
+		# "L1_weak", "OMP", or "LSMR" (see decode_CS). decode_precision 
+		# weights the squared error for "L1_weak"; OMP selects Kk components.
+		self.decode_opt_type = 'L1_strong'
+		self.decode_precision = 1.0
+		
+		# For "L1_weak" and "LSMR", if not None, entries of Rr smaller than 
+		# this are dropped and Rr is decoded as a sparse matrix, if mostly 
+		# empty.
+		self.decode_sparse_tol = None
+		
+		# If True, repeated encodes of the same object write Rr and dYy 
+		# into the arrays from the previous encode, rather than new ones.
+		self.reuse_buffers = False
+		
+		# Floating point type in which Kk1, Kk2, and Rr are stored; 'float32'
+		# halves their memory. Signals and activities remain float64.
+		self.dtype = 'float64'
+		
 		# Firing rate from receptor activity
 		# Temporal kernel is a liner combination of Gamma distributions K_1, 
 		# K_2, with beta = 1/tau_m: K = kernel_scale*K_1 
@@ -262,15 +575,25 @@ class four_state_receptor_CS(object):
 		self.memory_Rr = None
 				
 		# Overwrite variables with passed arguments	
-		for key in kwargs:
+		self._set_params(kwargs)
+		
+		self._matrix_shape = (self.Mm, self.Nn)
+	
+	def _set_params(self, params):
+		"""
+		Set attributes from a dictionary of parameters, casting those in
+		INT_PARAMS to int.
+		"""
+		
+		for key in params:
 		
 			assert hasattr(self, '%s' % key), "'%s' is not an attribute of "\
 				"four_state_receptor_CS class. Check or add to __init__" % key
 		
 			if key in INT_PARAMS:
-				exec ('self.%s = int(kwargs[key])' % key)
+				setattr(self, key, int(params[key]))
 			else:
-				exec ('self.%s = kwargs[key]' % key)
+				setattr(self, key, params[key])
 
 
 				
@@ -295,52 +618,20 @@ class four_state_receptor_CS(object):
 			self.Kk = self.Kk_1 + self.Kk_2
 			self.Kk_split = self.Kk_2
 			
-		params_dSs = [self.mu_dSs, self.sigma_dSs]
-		params_Ss0 = [self.mu_Ss0, self.sigma_Ss0]
-		self.dSs, self.idxs = sparse_vector([self.Nn, self.Kk], 
-												params_dSs,	seed=self.seed_dSs)
-		
-		# Replace components with conflicting background odor 
-		if (self.Kk_split is not None) and (self.Kk_split != 0):
-			assert 0 <= self.Kk_split <= self.Kk, \
-				"Splitting sparse signal into two levels requires Kk_split" \
-				" to be non-negative and less than or equal to Kk."
-			assert self.mu_dSs_2 is not None \
-				and self.sigma_dSs_2 is not None, \
-				"Splitting sparse signal into two levels requires that" \
-				" mu_dSs_2 and sigma_dSs_2 are set."
-
-			if self.seed_dSs_2 is None:
-				
-				# Want both odor 1 and odor 2 to be determined by seed_dSs
-				sp.random.seed(self.seed_dSs)
-				self.idxs_2 = sp.random.choice(self.idxs[0], self.Kk_split, 
-											replace=False)
-			else:
-				
-				# Want odor 1 and 2 to be determined by respective seeds.
-				self.dSs, self.idxs = sparse_vector([self.Nn, self.Kk_1], 
-												params_dSs,	seed=self.seed_dSs)
-				_, self.idxs_2 = sparse_vector([self.Nn, self.Kk_split], 
-												params_dSs,	seed=self.seed_dSs_2)
-				
-				# Re-define the full idxs and the odor 2 idxs subset
-				self.idxs = ((list(self.idxs[0]) + list(self.idxs_2[0])), )
-				self.idxs_2 = self.idxs_2[0]
-				
-			for idx_2 in self.idxs_2:
-				self.dSs[idx_2] = random_matrix(1, params=[self.mu_dSs_2,
-												self.sigma_dSs_2])
-		else:
-			self.idxs_2 = []
-			self.Kk_split = 0
-			
-		# Ss0 is the ideal (learned) background stimulus without noise
-		self.Ss0, self.Ss0_noisy = sparse_vector_bkgrnd([self.Nn, self.Kk], 
-														self.idxs, params_Ss0,
-														seed=self.seed_Ss0)
-		
-		self.Ss = self.dSs + self.Ss0_noisy
+		# Signals are shared between encodes with the same statistics 
+		# and seeds; the RNG is left as if they had been drawn.
+		self.dSs, self.idxs, self.idxs_2, self.Ss0, self.Ss0_noisy, \
+			self.Kk_split, rng_state = _call_cached(_sparse_signals_cached, 
+				self.Nn, self.Kk, self.Kk_1, self.Kk_split, self.mu_dSs, 
+				self.sigma_dSs, self.mu_dSs_2, self.sigma_dSs_2, 
+				self.mu_Ss0, self.sigma_Ss0, self.seed_dSs, 
+				self.seed_dSs_2, self.seed_Ss0)
+		if rng_state is not None:
+			np.random.set_state(rng_state)
+		
+		# dSs is only nonzero on idxs, so add it there alone
+		self.Ss = self.Ss0_noisy.copy()
+		self.Ss[self.idxs[0]] += self.dSs[self.idxs[0]]
 		
 	def set_manual_signals(self):
 		"""
@@ -360,7 +651,8 @@ class four_state_receptor_CS(object):
 														seed=self.seed_Ss0)
 		
 		# The true signal, including background noise
-		self.Ss = self.dSs + self.Ss0_noisy
+		self.Ss = self.Ss0_noisy.copy()
+		self.Ss[self.idxs] += self.dSs[self.idxs]
 	
 
 
@@ -380,64 +672,65 @@ class four_state_receptor_CS(object):
 									seed=self.seed_adapted_activity)
 		
 		# Break adaptation slightly by adjusting A0 with log of s0
-		sp.random.seed(self.seed_adapted_activity)
+		np.random.seed(self.seed_adapted_activity)
 		if (self.mu_dSs_2 is not None):
 			max_sig_comp = max(max(self.mu_dSs, self.mu_dSs_2), self.mu_Ss0)
 		else:
 			max_sig_comp = max(self.mu_dSs, self.mu_Ss0)
-		factors = sp.random.uniform(self.imperfect_A0_mult_min, 
+		factors = np.random.uniform(self.imperfect_A0_mult_min, 
 								    self.imperfect_A0_mult_max, self.Mm)
-		factors *= sp.log(max_sig_comp)/sp.log(10) + self.imperfect_A0_const
+		factors *= np.log(max_sig_comp)/np.log(10) + self.imperfect_A0_const
 		adapted_activity *= (1 + factors)
-		adapted_activity = sp.minimum(adapted_activity, 0.99)
-		if sp.mean(factors) > 1:
-			print ('activity factors:', sp.mean(factors), '+/-', sp.std(factors))
+		adapted_activity = np.minimum(adapted_activity, 0.99)
+		if np.mean(factors) > 1:
+			print ('activity factors:', np.mean(factors), '+/-', np.std(factors))
 		
 		# Scale the beta factor instead (breaks WL from 0 to 1)
-		sp.random.seed(self.seed_adapted_activity)
-		beta_scale_factors = sp.random.uniform(self.adaptive_beta_scaling_min, 
+		np.random.seed(self.seed_adapted_activity)
+		beta_scale_factors = np.random.uniform(self.adaptive_beta_scaling_min, 
 											   self.adaptive_beta_scaling_max, self.Mm)
 		
+		# Binding sums only need the Kk columns of the nonzero components
+		if self.Ss.ndim == 1:
+			support = np.flatnonzero(self.Ss)
+		else:
+			support = None
+		
 		self.eps = free_energy(self.Ss, self.Kk1, self.Kk2, adapted_activity, 
 							   self.binding_competitive, self.num_binding_sites, 
-							   beta_scale_factors)
+							   beta_scale_factors, support)
 		self.min_eps = random_matrix(self.Mm, params=[self.mu_min_eps, 
 									self.sigma_min_eps], seed=self.seed_eps)
 		self.max_eps = random_matrix(self.Mm, params=[self.mu_max_eps, 
 									self.sigma_max_eps], seed=self.seed_eps)
-		self.eps = sp.maximum(self.eps.T, self.min_eps).T
-		self.eps = sp.minimum(self.eps.T, self.max_eps).T
+		self.eps = np.maximum(self.eps.T, self.min_eps).T
+		self.eps = np.minimum(self.eps.T, self.max_eps).T
 		
 	def set_normal_free_energy(self):
 		"""
 		Set free energy as a function of odorant; normal tuning curve.
 		"""
 		
-		self.eps_base = self.mu_eps + self.normal_eps_tuning_prefactor* \
-						sp.exp(-(1.*sp.arange(self.Mm))**2.0/(2.0* \
-						self.normal_eps_tuning_width)**2.0)
-						
-		self.eps_base += random_matrix(self.Mm, params=[0, self.sigma_eps], 
-										seed=self.seed_eps)
-		
 		# If dual signal, use the average of the FULL signal nonzero components
 		if self.Kk_split == 0:
-			self.eps = self.WL_scaling*sp.log(self.mu_Ss0) + self.eps_base 
+			Ss_level = self.mu_Ss0
 		else:
-			self.eps = self.WL_scaling*sp.log(sp.average(self.Ss\
-							[self.Ss != 0])) + self.eps_base
-		
-		# Apply max and min epsilon value to each component
-		self.min_eps = random_matrix(self.Mm, params=[self.mu_min_eps, 
-									self.sigma_min_eps], seed=self.seed_eps)
-		self.max_eps = random_matrix(self.Mm, params=[self.mu_max_eps, 
-									self.sigma_max_eps], seed=self.seed_eps)
-		self.eps = sp.maximum(self.eps, self.min_eps)
-		self.eps = sp.minimum(self.eps, self.max_eps)
+			Ss_level = np.average(self.Ss[self.Ss != 0])
+		
+		self.eps_base, self.min_eps, self.max_eps, eps, rng_state = \
+			_call_cached(_normal_eps_cached, self.Mm, self.mu_eps, 
+				self.normal_eps_tuning_prefactor, 
+				self.normal_eps_tuning_width, self.sigma_eps, self.seed_eps, 
+				self.WL_scaling, Ss_level, self.mu_min_eps, 
+				self.sigma_min_eps, self.mu_max_eps, self.sigma_max_eps)
+		np.random.set_state(rng_state)
+		
+		# Copy, since eps may be updated in place during adaptation
+		self.eps = eps.copy()
 			
 		# If an array of signals, replicate for each signal.
 		if len(self.Ss.shape) > 1:
-			self.eps = sp.tile(self.eps, [self.Ss.shape[1], 1]).T
+			self.eps = np.tile(self.eps, [self.Ss.shape[1], 1]).T
 			
 	
 	######################################################
@@ -452,23 +745,19 @@ class four_state_receptor_CS(object):
 		values to be drawn from a reduced range.		
 		"""
 		
-		Kk1_los = random_matrix([self.Mm], params=[self.lo_Kk1_hyper_lo, 
-							self.lo_Kk1_hyper_hi], sample_type='uniform',
-							seed=self.seed_Kk1)
-		Kk1_his = random_matrix([self.Mm], params=[self.hi_Kk1_hyper_lo, 
-							self.hi_Kk1_hyper_hi], sample_type='uniform',
+		Kk1_los, Kk1_his = seeded_uniform_matrices([self.Mm], 
+							[[self.lo_Kk1_hyper_lo, self.lo_Kk1_hyper_hi], 
+							[self.hi_Kk1_hyper_lo, self.hi_Kk1_hyper_hi]], 
 							seed=self.seed_Kk1)
-		Kk2_los = random_matrix([self.Mm], params=[self.lo_Kk2_hyper_lo, 
-							self.lo_Kk2_hyper_hi], sample_type='uniform',
-							seed=self.seed_Kk2)
-		Kk2_his = random_matrix([self.Mm], params=[self.hi_Kk2_hyper_lo, 
-							self.hi_Kk2_hyper_hi], sample_type='uniform',
+		Kk2_los, Kk2_his = seeded_uniform_matrices([self.Mm], 
+							[[self.lo_Kk2_hyper_lo, self.lo_Kk2_hyper_hi], 
+							[self.hi_Kk2_hyper_lo, self.hi_Kk2_hyper_hi]], 
 							seed=self.seed_Kk2)
 		
-		self.Kk1 = random_matrix([self.Mm, self.Nn], [Kk1_los, Kk1_his, 
+		self.Kk1 = random_matrix(self._matrix_shape, [Kk1_los, Kk1_his, 
 								self.power_exp], sample_type='rank2_row_power',
 								seed = self.seed_Kk1)
-		self.Kk2 = random_matrix([self.Mm, self.Nn], [Kk2_los, Kk2_his, 
+		self.Kk2 = random_matrix(self._matrix_shape, [Kk2_los, Kk2_his, 
 								self.power_exp], sample_type='rank2_row_power', 
 								seed = self.seed_Kk2)
 		
@@ -476,6 +765,16 @@ class four_state_receptor_CS(object):
 		if self.high_responders == True:
 			self.manual_Kk_replace()
 		
+		self._cast_Kk()
+		
+		
+	def _cast_Kk(self):
+		"""
+		Store Kk1 and Kk2 with the floating point type set by dtype.
+		"""
+		
+		self.Kk1 = self.Kk1.astype(self.dtype, copy=False)
+		self.Kk2 = self.Kk2.astype(self.dtype, copy=False)
 		
 	def set_mixture_Kk(self, clip=True):
 		"""
@@ -487,32 +786,14 @@ class four_state_receptor_CS(object):
 		assert 0 <= self.Kk1_p <= 1., "Kk1 Mixture ratio must be between 0 and 1"
 		assert 0 <= self.Kk2_p <= 1., "Kk2 Mixture ratio must be between 0 and 1"
 		
-		self.Kk1 = sp.zeros((self.Mm, self.Nn))
-		self.Kk2 = sp.zeros((self.Mm, self.Nn))
-		
-		num_comp1 = int(self.Kk1_p*self.Mm)
-		num_comp2 = self.Mm - num_comp1
-		params_Kk1_1 = [self.mu_Kk1_1, self.sigma_Kk1_1]
-		params_Kk1_2 = [self.mu_Kk1_2, self.sigma_Kk1_2]
-		self.Kk1[:num_comp1, :] = random_matrix([num_comp1, self.Nn], 
-										params_Kk1_1, seed = self.seed_Kk1)
-		self.Kk1[num_comp1:, :] = random_matrix([num_comp2, self.Nn], 
-										params_Kk1_2, seed = self.seed_Kk1)
-		
-		num_comp1 = int(self.Kk2_p*self.Mm)
-		num_comp2 = self.Mm - num_comp1
-		params_Kk2_1 = [self.mu_Kk2_1, self.sigma_Kk2_1]
-		params_Kk2_2 = [self.mu_Kk2_2, self.sigma_Kk2_2]
-		
-		self.Kk2[:num_comp1, :] = random_matrix([num_comp1, self.Nn], 
-										params_Kk2_1, seed = self.seed_Kk2)		
-		self.Kk2[num_comp1:, :] = random_matrix([num_comp2, self.Nn], 
-										params_Kk2_2, seed = self.seed_Kk2)
+		self.Kk1, self.Kk2, rng_state = _call_cached(_mixture_Kk_cached, 
+			self._matrix_shape, self.Kk1_p, self.mu_Kk1_1, self.sigma_Kk1_1, 
+			self.mu_Kk1_2, self.sigma_Kk1_2, self.Kk2_p, self.mu_Kk2_1, 
+			self.sigma_Kk2_1, self.mu_Kk2_2, self.sigma_Kk2_2, 
+			self.seed_Kk1, self.seed_Kk2, clip, self.dtype)
+		np.random.set_state(rng_state)
 		
-		if clip == True:
-			array_dict = clip_array(dict(Kk1 = self.Kk1, Kk2 = self.Kk2))
-			self.Kk1 = array_dict['Kk1']
-			self.Kk2 = array_dict['Kk2']
+		self._cast_Kk()
 												
 	def set_normal_Kk(self, clip=True):	
 		"""
@@ -521,31 +802,15 @@ class four_state_receptor_CS(object):
 		sigma_Kk1_hyper_lo, sigma_Kk1_hyper_hi, etc.)
 		"""
 		
-		Kk1_mus = random_matrix([self.Mm], params=[self.mu_Kk1_hyper_lo, 
-							self.mu_Kk1_hyper_hi], sample_type='uniform',
-							seed=self.seed_Kk1)
-		Kk1_sigmas = random_matrix([self.Mm], params=[self.sigma_Kk1_hyper_lo, 
-							self.sigma_Kk1_hyper_hi], sample_type='uniform',
-							seed=self.seed_Kk1)
-		Kk2_mus = random_matrix([self.Mm], params=[self.mu_Kk2_hyper_lo, 
-							self.mu_Kk2_hyper_hi], sample_type='uniform',
-							seed=self.seed_Kk2)
-		Kk2_sigmas = random_matrix([self.Mm], params=[self.sigma_Kk2_hyper_lo,
-							self.sigma_Kk2_hyper_hi], sample_type='uniform',
-							seed=self.seed_Kk2)
-		
-		self.Kk1 = random_matrix([self.Mm, self.Nn], [Kk1_mus, Kk1_sigmas], 
-									sample_type='rank2_row_gaussian', 
-									seed = self.seed_Kk1)
-		self.Kk2 = random_matrix([self.Mm, self.Nn], [Kk2_mus, Kk2_sigmas],
-									sample_type='rank2_row_gaussian', 
-									seed = self.seed_Kk2)
+		self.Kk1, self.Kk2, rng_state = _call_cached(_normal_Kk_cached, 
+			self._matrix_shape, self.mu_Kk1_hyper_lo, self.mu_Kk1_hyper_hi, 
+			self.sigma_Kk1_hyper_lo, self.sigma_Kk1_hyper_hi, 
+			self.mu_Kk2_hyper_lo, self.mu_Kk2_hyper_hi, 
+			self.sigma_Kk2_hyper_lo, self.sigma_Kk2_hyper_hi, 
+			self.seed_Kk1, self.seed_Kk2, clip, self.dtype)
+		np.random.set_state(rng_state)
 		
-
-		if clip == True:
-			array_dict = clip_array(dict(Kk1 = self.Kk1, Kk2 = self.Kk2))
-			self.Kk1 = array_dict['Kk1']
-			self.Kk2 = array_dict['Kk2']
+		self._cast_Kk()
 	
 	def set_uniform_Kk(self, clip=True):
 		"""
@@ -554,31 +819,28 @@ class four_state_receptor_CS(object):
 		hi_Kk1_hyper_lo, hi_Kk1_hyper_hi, etc.)
 		"""
 		
-		Kk1_los = random_matrix([self.Mm], params=[self.lo_Kk1_hyper_lo, 
-							self.lo_Kk1_hyper_hi], sample_type='uniform',
-							seed=self.seed_Kk1)
-		Kk1_his = random_matrix([self.Mm], params=[self.hi_Kk1_hyper_lo, 
-							self.hi_Kk1_hyper_hi], sample_type='uniform',
+		Kk1_los, Kk1_his = seeded_uniform_matrices([self.Mm], 
+							[[self.lo_Kk1_hyper_lo, self.lo_Kk1_hyper_hi], 
+							[self.hi_Kk1_hyper_lo, self.hi_Kk1_hyper_hi]], 
 							seed=self.seed_Kk1)
-		Kk2_los = random_matrix([self.Mm], params=[self.lo_Kk2_hyper_lo, 
-							self.lo_Kk2_hyper_hi], sample_type='uniform',
-							seed=self.seed_Kk2)
-		Kk2_his = random_matrix([self.Mm], params=[self.hi_Kk2_hyper_lo, 
-							self.hi_Kk2_hyper_hi], sample_type='uniform',
+		Kk2_los, Kk2_his = seeded_uniform_matrices([self.Mm], 
+							[[self.lo_Kk2_hyper_lo, self.lo_Kk2_hyper_hi], 
+							[self.hi_Kk2_hyper_lo, self.hi_Kk2_hyper_hi]], 
 							seed=self.seed_Kk2)
 		
-		self.Kk1 = random_matrix([self.Mm, self.Nn], [Kk1_los, Kk1_his], 
+		self.Kk1 = random_matrix(self._matrix_shape, [Kk1_los, Kk1_his], 
 								sample_type='rank2_row_uniform', 
 								seed = self.seed_Kk1)
-		self.Kk2 = random_matrix([self.Mm, self.Nn], [Kk2_los, Kk2_his], 
+		self.Kk2 = random_matrix(self._matrix_shape, [Kk2_los, Kk2_his], 
 								sample_type='rank2_row_uniform', 
 								seed = self.seed_Kk2)
 		
 		
 		if clip == True:
-			array_dict = clip_array(dict(Kk1 = self.Kk1, Kk2 = self.Kk2))
-			self.Kk1 = array_dict['Kk1']
-			self.Kk2 = array_dict['Kk2']
+			clip_inplace(self.Kk1, 'Kk1')
+			clip_inplace(self.Kk2, 'Kk2')
+		
+		self._cast_Kk()
 					
 					
 	def manual_Kk_replace(self):
@@ -591,9 +853,9 @@ class four_state_receptor_CS(object):
 		self.set_normal_free_energy()
 		
 		# Get tuning curves
-		tuning_curves = sp.zeros((self.Mm, self.Nn))
+		tuning_curves = np.zeros((self.Mm, self.Nn))
 		for iN in range(self.Nn):
-			tuning_Ss = sp.zeros(self.Nn)
+			tuning_Ss = np.zeros(self.Nn)
 			tuning_Ss[iN] = self.manual_Kk_replace_Ss
 			tuning_curves[:, iN] = receptor_activity(tuning_Ss, self.Kk1, 
 														self.Kk2, self.eps, 
@@ -602,9 +864,9 @@ class four_state_receptor_CS(object):
 
 		# Add specialist responses to weak responders
 		for iM in range(self.Mm):
-			if sp.mean(tuning_curves[iM, :]) < self.manual_Kk_replace_min_act:
-				self.Kk2[iM, sp.random.randint(self.Nn)] = \
-					10.**sp.random.uniform(self.manual_Kk_replace_lo, 
+			if np.mean(tuning_curves[iM, :]) < self.manual_Kk_replace_min_act:
+				self.Kk2[iM, np.random.randint(self.Nn)] = \
+					10.**np.random.uniform(self.manual_Kk_replace_lo, 
 					self.manual_Kk_replace_hi)
 
 							
@@ -626,35 +888,20 @@ class four_state_receptor_CS(object):
 		another background state.
 		"""
 		
-		matrix_shape = [self.Mm, self.Nn]
+		mu_Ss0 = kwargs.get('mu_Ss0', self.mu_Ss0)
+		mu_eps = kwargs.get('mu_eps', self.mu_eps)
 		
-		params_Kk1 = [self.mu_Kk1, self.sigma_Kk1]
-		self.Kk1 = random_matrix(matrix_shape, params_Kk1, seed=self.seed_Kk1)
-	
-		mu_Ss0 = self.mu_Ss0
-		mu_eps = self.mu_eps
-		for key in kwargs:
-			exec ('%s = kwargs[key]' % key)
-		
-		mu_stats = [self.receptor_tuning_mu_hyper_mu, 
-					self.receptor_tuning_mu_hyper_sigma]
-		sigma_stats = [self.receptor_tuning_sigma_hyper_lo, 
-						self.receptor_tuning_sigma_hyper_hi]
-		activity_mus = random_matrix([self.Mm], params=mu_stats, 
-										sample_type='normal',
-										seed=self.seed_receptor_activity)
-		activity_sigmas = random_matrix([self.Mm], params=sigma_stats, 
-										sample_type='uniform',
-										seed=self.seed_receptor_activity)
-		
-		self.Kk2 = Kk2_eval_normal_activity(matrix_shape, activity_mus, 
-										activity_sigmas, mu_Ss0, mu_eps, 
-										self.seed_Kk2)
+		self.Kk1, self.Kk2, rng_state = _call_cached(
+			_Kk2_normal_activity_cached, self._matrix_shape, self.mu_Kk1, 
+			self.sigma_Kk1, self.receptor_tuning_mu_hyper_mu, 
+			self.receptor_tuning_mu_hyper_sigma, 
+			self.receptor_tuning_sigma_hyper_lo, 
+			self.receptor_tuning_sigma_hyper_hi, mu_Ss0, mu_eps, 
+			self.seed_Kk1, self.seed_Kk2, self.seed_receptor_activity, clip, 
+			self.dtype)
+		np.random.set_state(rng_state)
 		
-		if clip == True:
-			array_dict = clip_array(dict(Kk1 = self.Kk1, Kk2 = self.Kk2))
-			self.Kk1 = array_dict['Kk1']
-			self.Kk2 = array_dict['Kk2']
+		self._cast_Kk()
 	
 	def set_Kk2_uniform_activity(self, clip=True, **kwargs):
 		"""
@@ -662,15 +909,13 @@ class four_state_receptor_CS(object):
 		where each activity is chosen from a single uniform distribution.
 		"""
 		
-		matrix_shape = [self.Mm, self.Nn]
+		matrix_shape = self._matrix_shape
 		
 		params_Kk1 = [self.mu_Kk1, self.sigma_Kk1]
 		self.Kk1 = random_matrix(matrix_shape, params_Kk1, seed=self.seed_Kk1)
 	
-		mu_Ss0 = self.mu_Ss0
-		mu_eps = self.mu_eps
-		for key in kwargs:
-			exec ('%s = kwargs[key]' % key)
+		mu_Ss0 = kwargs.get('mu_Ss0', self.mu_Ss0)
+		mu_eps = kwargs.get('mu_eps', self.mu_eps)
 		
 		params_Kk2 = [self.uniform_activity_lo, self.uniform_activity_hi]
 		self.Kk2 = Kk2_eval_uniform_activity(matrix_shape, params_Kk2, 
@@ -678,9 +923,10 @@ class four_state_receptor_CS(object):
 											self.seed_Kk2)
 		
 		if clip == True:
-			array_dict = clip_array(dict(Kk1 = self.Kk1, Kk2 = self.Kk2))
-			self.Kk1 = array_dict['Kk1']
-			self.Kk2 = array_dict['Kk2']
+			clip_inplace(self.Kk1, 'Kk1')
+			clip_inplace(self.Kk2, 'Kk2')
+		
+		self._cast_Kk()
 	
 	def set_Kk2_normal_activity_mixture(self, clip=True, **kwargs):
 		"""
@@ -688,62 +934,105 @@ class four_state_receptor_CS(object):
 		where each activity is chosen from a Gaussian mixture.
 		"""
 		
-		matrix_shape = [self.Mm, self.Nn]
+		matrix_shape = self._matrix_shape
 		
 		params_Kk1 = [self.mu_Kk1, self.sigma_Kk1]
 		self.Kk1 = random_matrix(matrix_shape, params_Kk1, seed=self.seed_Kk1)
 	
-		mu_Ss0 = self.mu_Ss0
-		mu_eps = self.mu_eps
-		for key in kwargs:
-			exec ('%s = kwargs[key]' % key)
+		mu_Ss0 = kwargs.get('mu_Ss0', self.mu_Ss0)
+		mu_eps = kwargs.get('mu_eps', self.mu_eps)
 		
 		assert 0 <= self.activity_p <= 1., "Mixture ratio must be between 0 and 1"
 		
-		activity_mus = sp.zeros(self.Mm)
-		activity_sigmas = sp.zeros(self.Mm)
-		
 		num_comp1 = int(self.activity_p*self.Mm)
 		num_comp2 = self.Mm - num_comp1
 		
-		activity_mus[:num_comp1] = self.receptor_tuning_mixture_mu_1
-		activity_mus[num_comp1:] = self.receptor_tuning_mixture_mu_2
-		activity_sigmas[:num_comp1] = self.receptor_tuning_mixture_sigma_1
-		activity_sigmas[num_comp1:] = self.receptor_tuning_mixture_sigma_2
+		activity_mus = np.repeat(np.array([
+						self.receptor_tuning_mixture_mu_1, 
+						self.receptor_tuning_mixture_mu_2], dtype=float), 
+						[num_comp1, num_comp2])
+		activity_sigmas = np.repeat(np.array([
+						self.receptor_tuning_mixture_sigma_1, 
+						self.receptor_tuning_mixture_sigma_2], dtype=float), 
+						[num_comp1, num_comp2])
 		
 		self.Kk2 = Kk2_eval_normal_activity(matrix_shape, activity_mus, 
 											activity_sigmas, mu_Ss0, mu_eps, 
 											self.seed_Kk2)
 		
 		if clip == True:
-			array_dict = clip_array(dict(Kk1 = self.Kk1, Kk2 = self.Kk2))
-			self.Kk1 = array_dict['Kk1']
-			self.Kk2 = array_dict['Kk2']
+			clip_inplace(self.Kk1, 'Kk1')
+			clip_inplace(self.Kk2, 'Kk2')
+		
+		self._cast_Kk()
+	
+	def _buffer(self, name, shape):
+		"""
+		Array currently held in attribute `name', to be overwritten, if 
+		reuse_buffers is set and it is a writeable array of the given 
+		shape; else None, so that a new array is allocated.
+		"""
+		
+		if not self.reuse_buffers:
+			return None
+		
+		array = getattr(self, name)
+		if isinstance(array, np.ndarray) and array.shape == tuple(shape) \
+				and array.flags.writeable:
+			return array
+		
+		return None
+	
+	def _kernel_params(self):
+		"""
+		List of temporal kernel parameters, in the order expected by 
+		kinetics.temporal_kernel.
+		"""
+		
+		return [self.kernel_T, self.kernel_dt, self.kernel_tau_1, 
+				self.kernel_tau_2, self.kernel_shape_1, self.kernel_shape_2, 
+				self.kernel_alpha, self.kernel_scale]
 	
 	def set_measured_activity(self):
 		"""
 		Set the full measured activity, from nonlinear response.
 		"""
 		
-		# Learned background firing only utilizes average background signal
-		self.Yy0 = receptor_activity(self.Ss0, self.Kk1, self.Kk2, self.eps, 
-									 self.binding_competitive, 
-									 self.num_binding_sites)
-
-		self.Yy = receptor_activity(self.Ss, self.Kk1, self.Kk2, self.eps, 
-									self.binding_competitive,
-									self.num_binding_sites)
+		# Single signals are Kk-sparse, so restrict the binding sums to the 
+		# joint support of Ss and Ss0
+		if np.ndim(self.Ss) == 1 and np.ndim(self.Ss0) == 1:
+			self.Ss_idxs = np.flatnonzero((self.Ss != 0) | (self.Ss0 != 0))
+		else:
+			self.Ss_idxs = None
+		
+		# Learned background firing only utilizes average background signal.
+		# For a single signal and background, the activities and the 
+		# linearized gain share the inverse constants and binding sums, so 
+		# compute them together and keep the gain for set_linearized_response
+		if (self.Ss_idxs is not None) and np.ndim(self.eps) == 1:
+			self.Yy, self.Yy0, Rr = activity_and_gain(self.Ss, self.Ss0, 
+									self.Kk1, self.Kk2, self.eps, 
+									self.binding_competitive, 
+									self.num_binding_sites, 
+									support=self.Ss_idxs, 
+									out=self._buffer('Rr', self._matrix_shape))
+			self._bkgrnd_gain = (self.Ss0, self.Kk1, self.Kk2, self.eps, Rr)
+		else:
+			self.Yy0 = receptor_activity(self.Ss0, self.Kk1, self.Kk2, 
+										 self.eps, self.binding_competitive, 
+										 self.num_binding_sites)
+			self.Yy = receptor_activity(self.Ss, self.Kk1, self.Kk2, 
+										self.eps, self.binding_competitive,
+										self.num_binding_sites)
+			self._bkgrnd_gain = None
  
-		self.Yy += sp.random.normal(0, self.meas_noise, self.Mm)
+		self.Yy += np.random.normal(0, self.meas_noise, self.Mm)
 		
 		# Apply temporal kernel
 		if self.temporal_run == False:
 			pass
 		else:
-			kernel_params = [self.kernel_T, self.kernel_dt, self.kernel_tau_1, 
-								self.kernel_tau_2, self.kernel_shape_1, 
-								self.kernel_shape_2,self.kernel_alpha, 
-								self.kernel_scale]
+			kernel_params = self._kernel_params()
 			self.Yy0, self.memory_Yy0 = temporal_kernel(self.Yy0, 
 										self.memory_Yy0, self.signal_trace_Tt, 
 										kernel_params)
@@ -755,20 +1044,21 @@ class four_state_receptor_CS(object):
 		self.Yy0 *= self.NL_scale*(self.Yy > self.NL_threshold)
 		self.Yy *= self.NL_scale*(self.Yy > self.NL_threshold)
 		
-		self.Yy0 = sp.minimum(self.Yy0, self.firing_max)
-		self.Yy = sp.minimum(self.Yy, self.firing_max)
+		np.minimum(self.Yy0, self.firing_max, out=self.Yy0)
+		np.minimum(self.Yy, self.firing_max, out=self.Yy)
 		
 		
-		# Measured response above background
-		self.dYy = self.Yy - self.Yy0
-	
 		# Add effects of divisive normalization if called.
 		if self.divisive_normalization == True:
 			self.Yy0 = inhibitory_normalization(self.Yy0, self.inh_C, 
 						self.inh_D, self.inh_eta, self.inh_R)
 			self.Yy = inhibitory_normalization(self.Yy, self.inh_C, 
 						self.inh_D, self.inh_eta, self.inh_R)
-			self.dYy = self.Yy - self.Yy0
+		
+		# Measured response above background; taken once, after any 
+		# normalization
+		self.dYy = np.subtract(self.Yy, self.Yy0, 
+								out=self._buffer('dYy', self.Yy.shape))
 			
 		
 		
@@ -787,18 +1077,25 @@ class four_state_receptor_CS(object):
 		# The linear response is scaled same as the activity.
 		# Ignore the threshold here: assume that system thinks everything
 		# is firing.
-		self.Rr = linear_gain(self.Ss0, self.Kk1, self.Kk2, self.eps, 
-							  self.binding_competitive, self. num_binding_sites)
+		# Reuse the gain from set_measured_activity if the background and
+		# constants are unchanged; it is consumed here since Rr is scaled
+		# in place below.
+		cache = getattr(self, '_bkgrnd_gain', None)
+		self._bkgrnd_gain = None
+		if cache is not None and all(cached is current for cached, current 
+				in zip(cache[:4], (self.Ss0, self.Kk1, self.Kk2, self.eps))):
+			self.Rr = cache[4]
+		else:
+			self.Rr = linear_gain(self.Ss0, self.Kk1, self.Kk2, self.eps, 
+								  self.binding_competitive, 
+								  self.num_binding_sites)
 		
 		# Apply temporal kernel
 		if self.temporal_run == False:
 			pass
 			#self.Rr *= self.kernel_scale*(1 - 2*self.kernel_alpha)
 		else:
-			kernel_params = [self.kernel_T, self.kernel_dt, self.kernel_tau_1, 
-								self.kernel_tau_2, self.kernel_shape_1, 
-								self.kernel_shape_2, self.kernel_alpha, 
-								self.kernel_scale]
+			kernel_params = self._kernel_params()
 			self.Rr, self.memory_Rr = temporal_kernel(self.Rr, 
 										self.memory_Rr, self.signal_trace_Tt, 
 										kernel_params)
@@ -810,12 +1107,27 @@ class four_state_receptor_CS(object):
 			self.Rr = inhibitory_normalization_linear_gain(self.Yy0, self.Rr, 
 						self.inh_C, self.inh_D, self.inh_eta, self.inh_R)
 		
-	def decode(self):
+		self.Rr = self.Rr.astype(self.dtype, copy=False)
+		
+	def decode(self, warm_start=None, gram=None):
 		"""
-		Decode the response via CS.
+		Decode the response via CS. warm_start is an optional initial
+		estimate, such as the estimate at the previous timestep; gram is
+		an optional precomputed Rr^T Rr, used by OMP decoding. For L1_weak
+		and LSMR decoding, Rr is thresholded to a sparse matrix if 
+		decode_sparse_tol is set.
 		"""
 		
-		self.dSs_est = decode_CS(self.Rr, self.dYy)	
+		Rr = self.Rr
+		if (self.decode_sparse_tol is not None) and \
+				(self.decode_opt_type in SPARSE_OPT_TYPES):
+			Rr = thresholded_csr(self.Rr, self.decode_sparse_tol)
+		
+		self.dSs_est = decode_CS(Rr, self.dYy, 
+									opt_type=self.decode_opt_type, 
+									precision=self.decode_precision, 
+									num_nonzero=self.Kk, 
+									warm_start=warm_start, gram=gram)
 		
 	def decode_nonlinear(self):
 		"""
@@ -859,7 +1171,7 @@ class four_state_receptor_CS(object):
 				% self.signal_trace_file_2)
 			assert len(self.signal_trace_Tt) == len(signal_data_2[:, 0]), \
 				"signal_trace_file_2 must be same length as signal_trace_file"
-			assert  sp.allclose(self.signal_trace_Tt, signal_data_2[:, 0], 
+			assert  np.allclose(self.signal_trace_Tt, signal_data_2[:, 0], 
 				1e-6), "signal_trace_file_2 must have same time array as "\
 				"signal_trace_file"
 			self.signal_trace_2 = (signal_data_2[:, 1] + \
@@ -882,13 +1194,13 @@ class four_state_receptor_CS(object):
 		activity_stats = [self.adapted_activity_mu, self.adapted_activity_sigma]
 		perfect_adapt_Yy =  random_matrix([self.Mm], params=activity_stats, 
 									seed=self.seed_adapted_activity)
-		beta_scale_factors = sp.random.uniform(self.adaptive_beta_scaling_min, 
+		beta_scale_factors = np.random.uniform(self.adaptive_beta_scaling_min, 
 											   self.adaptive_beta_scaling_max, 
 											   self.Mm)
 		
 		# This is a kind of hacky way to incorporate WL breaking. 
 		# Requires Kk1 to be small
-		Kk2_sum = sp.dot(self.Kk2**-1.0, self.Ss).T
+		Kk2_sum = np.dot(self.Kk2**-1.0, self.Ss).T
 		den = perfect_adapt_Yy.T*(1 - (1/Kk2_sum)**beta_scale_factors)\
 				+ (1/Kk2_sum)**beta_scale_factors
 		perfect_adapt_Yy = (perfect_adapt_Yy.T/den)
@@ -901,7 +1213,7 @@ class four_state_receptor_CS(object):
 				"setting new epsilon with set_temporal_adapted_epsilon, "\
 				"you must call set_ordered_temporal_adaptation_rate, since "\
 				"temporal_adaptation_rate_sigma is nonzero"
-			self.temporal_adaptation_rate_vector = sp.ones(self.Mm)*\
+			self.temporal_adaptation_rate_vector = np.ones(self.Mm)*\
 				self.temporal_adaptation_rate
 		
 		# Receptor activity used for adaptation is not firing rate; just
@@ -920,8 +1232,8 @@ class four_state_receptor_CS(object):
 									perfect_adapt_Yy)
 		
 		# Enforce epsilon limits
-		self.eps = sp.maximum(self.eps.T, self.min_eps).T
-		self.eps = sp.minimum(self.eps.T, self.max_eps).T
+		self.eps = np.maximum(self.eps.T, self.min_eps).T
+		self.eps = np.minimum(self.eps.T, self.max_eps).T
 			
 	def set_ordered_temporal_adaptation_rate(self):
 		"""
@@ -939,8 +1251,8 @@ class four_state_receptor_CS(object):
 			print('Must run set_measured_activity(...) before calling '\
 				'set_ordered_temporal_adaptation_rate(...)')
 		
-		sp.random.seed(self.temporal_adaptation_rate_seed)
-		exp_spread = sp.random.normal(0, self.temporal_adaptation_rate_sigma, 
+		np.random.seed(self.temporal_adaptation_rate_seed)
+		exp_spread = np.random.normal(0, self.temporal_adaptation_rate_sigma, 
 									  self.Mm)
 		self.temporal_adaptation_rate_vector = self.temporal_adaptation_rate*\
 												10.**exp_spread
@@ -953,97 +1265,114 @@ class four_state_receptor_CS(object):
 
 		
 	
+	def encode(self, kind, **kwargs):
+		"""
+		Run the encoding pipeline `kind', a key of _PIPELINES. Keyword
+		arguments are passed to the Kk2 activity step, if any.
+		"""
+		
+		try:
+			steps = self._PIPELINES[kind]
+		except KeyError:
+			print('Encoding pipeline "%s" not defined; options are %s' 
+					% (kind, sorted(self._PIPELINES.keys())))
+			quit()
+		
+		for step in steps:
+			if step in self._KWARG_STEPS:
+				getattr(self, step)(**kwargs)
+			else:
+				getattr(self, step)()
+	
+	@classmethod
+	def compile(cls, Nn, Kk, Mm, kind='normal_activity', **kwargs):
+		"""
+		Build an encoder-decoder for a sweep in which Nn, Kk, and Mm are 
+		fixed. A single object is constructed with these sizes and the 
+		fixed kwargs, with reuse_buffers set, and reused for every call, 
+		so Rr and dYy are written into the same arrays throughout.
+		
+		Args:
+			Nn, Kk, Mm: Ints; fixed sizes of the sweep.
+			kind: String; encoding pipeline, a key of _PIPELINES.
+			kwargs: Parameters fixed over the sweep.
+			
+		Returns:
+			encode_decode: function of a dictionary of parameters for a 
+				single point of the sweep; sets them, encodes with 
+				encode(kind), decodes, and returns dSs_est. Parameters set 
+				by earlier calls but absent from the dictionary revert to 
+				their values at construction.
+		"""
+		
+		obj = cls(Nn=Nn, Kk=Kk, Mm=Mm, reuse_buffers=True, **kwargs)
+		initial_params = dict()
+		
+		def encode_decode(params):
+			for key in ('Nn', 'Kk', 'Mm'):
+				assert key not in params or params[key] == getattr(obj, key), \
+					"%s is fixed to %s by compile" % (key, getattr(obj, key))
+			
+			for key in params:
+				if key not in initial_params:
+					initial_params[key] = getattr(obj, key, None)
+			obj._set_params(initial_params)
+			obj._set_params(params)
+			
+			obj.encode(kind)
+			obj.decode()
+			
+			return obj.dSs_est
+		
+		return encode_decode
+	
 	def encode_normal_activity(self, **kwargs):
 		# Run all functions to encode when activity is normally distributed.
-		self.set_sparse_signals()
-		self.set_normal_free_energy()
-		self.set_Kk2_normal_activity(**kwargs)
-		self.set_measured_activity()
-		self.set_linearized_response()
+		self.encode('normal_activity', **kwargs)
 	
 	def encode_uniform_activity(self, **kwargs):
 		# Run all functions to encode when activity is uniformly distributed.
-		self.set_sparse_signals()
-		self.set_normal_free_energy()
-		self.set_Kk2_uniform_activity(**kwargs)
-		self.set_measured_activity()
-		self.set_linearized_response()
+		self.encode('uniform_activity', **kwargs)
 	
 	def encode_normal_activity_mixture(self, **kwargs):
 		# Run all functions to encode when activity arises from a mixture.
-		self.set_sparse_signals()
-		self.set_normal_free_energy()
-		self.set_Kk2_normal_activity_mixture(**kwargs)
-		self.set_measured_activity()
-		self.set_linearized_response()
+		self.encode('normal_activity_mixture', **kwargs)
 	
 	def encode_normal_Kk(self):
 		# Run all functions to encode when K matrices are Gaussian.
-		self.set_sparse_signals()
-		self.set_normal_free_energy()
-		self.set_normal_Kk()
-		self.set_measured_activity()
-		self.set_linearized_response()
+		self.encode('normal_Kk')
 	
 	def encode_uniform_Kk(self):
 		# Run all functions to encode when K matrices are uniform.
-		self.set_sparse_signals()
-		self.set_normal_free_energy()
-		self.set_uniform_Kk()
-		self.set_measured_activity()
-		self.set_linearized_response()
+		self.encode('uniform_Kk')
 	
 	def encode_mixture_Kk(self):
 		# Run all functions to encode when full activity of each receptor 
 		# is from a Gaussian mixture.
-		self.set_sparse_signals()
-		self.set_normal_free_energy()
-		self.set_mixture_Kk()
-		self.set_measured_activity()
-		self.set_linearized_response()
+		self.encode('mixture_Kk')
 		
 	def encode_adapted_normal_activity(self):
 		# Run all functions to encode when full activity of each receptor 
 		# is normal.
-		self.set_sparse_signals()
-		self.set_normal_Kk()
-		self.set_adapted_free_energy()
-		self.set_measured_activity()
-		self.set_linearized_response()
+		self.encode('adapted_normal_activity')
 
 	def encode_manual_signal_normal_Kk(self):
 		# Run all functions to encode when K matrices are normal and the 
 		# signal components are manually set (e.g. for tuning curves)
-		self.set_manual_signals()
-		self.set_normal_Kk()
-		self.set_normal_free_energy()
-		self.set_measured_activity()
-		self.set_linearized_response()
+		self.encode('manual_signal_normal_Kk')
 	
 	def encode_manual_signal_uniform_Kk(self):
 		# Run all functions to encode when K matrices are uniform and the 
 		# signal components are manually set (e.g. for tuning curves)
-		self.set_manual_signals()
-		self.set_uniform_Kk()
-		self.set_normal_free_energy()
-		self.set_measured_activity()
-		self.set_linearized_response()
+		self.encode('manual_signal_uniform_Kk')
 	
 	def encode_power_Kk(self):
 		# Run all functions to encode when binding constants are 
 		# taken from  a power law distribution and the energy is 
 		# adapted to keep activity levels constant
-		self.set_sparse_signals()
-		self.set_power_Kk()
-		self.set_normal_free_energy()
-		self.set_measured_activity()
-		self.set_linearized_response()
+		self.encode('power_Kk')
 	
 	def encode_power_Kk_adapted(self):
 		# Run all functions to encode when binding constants are power
 		# law distributed; can add high responders as well.
-		self.set_sparse_signals()
-		self.set_power_Kk()
-		self.set_adapted_free_energy()
-		self.set_measured_activity()
-		self.set_linearized_response()
+		self.encode('power_Kk_adapted')
@@ -10,7 +10,7 @@ To view a copy of this license,
 visit http://creativecommons.org/licenses/by-nc-sa/4.0/.
 """
 
-import scipy as sp
+import numpy as np
 from stats import Kk_dist_Gaussian_activity
 from scipy.stats import gamma
 from scipy.interpolate import interp1d
@@ -18,35 +18,49 @@ import warnings
 import sys
 
 
-def linear_gain(Ss0, Kk1, Kk2, eps, comp=True, num_sites=1):
+# Approximate size, in bytes, of the temporaries per block of receptors
+# in linear_gain; about the size of a per-core L2 cache.
+GAIN_BLOCK_BYTES = 2**18
+
+def linear_gain(Ss0, Kk1, Kk2, eps, comp=True, num_sites=1, out=None):
 	"""
 	Set linearized binding and activation gain. `comp' sets whether the 
 	binding is competitive or non-competitive. `num_sites' sets the 
-	number of independent binding sites per receptor.
+	number of independent binding sites per receptor. The gain is 
+	computed in blocks of receptors, so that the temporaries for each
+	block stay in cache (see GAIN_BLOCK_BYTES); `out' optionally holds 
+	the (Mm, Nn) result.
 	"""
 	
-	dAadSs0 = sp.zeros(Kk1.shape)
-	Mm = Kk1.shape[0]
-	Nn = Kk1.shape[1]
-
-	if comp == True:
+	Mm, Nn = Kk1.shape
+	if out is None:
+		out = np.empty((Mm, Nn))
 	
-		Kk1_sum = sp.dot(Kk1**-1.0, Ss0)
-		Kk2_sum = sp.dot(Kk2**-1.0, Ss0)
-		A0 = 1./(1. + sp.exp(eps)*(1 + Kk1_sum)**num_sites/(1 + Kk2_sum)**num_sites)
+	if comp == True:
+		eps = np.broadcast_to(eps, (Mm,))
 		
-		for iM in range(Mm):
-			WL_term = num_sites*((1./Kk1[iM,:])/(sp.ones(Nn) + Kk1_sum[iM]) - 
-							(1./Kk2[iM,:])/(sp.ones(Nn) + Kk2_sum[iM]))
-			dAadSs0[iM,:] = -A0[iM]*(sp.ones(Nn) - A0[iM])*WL_term
-
+		# Two (block_rows, Nn) float64 temporaries per block
+		block_rows = max(1, GAIN_BLOCK_BYTES//(16*Nn))
+		for iM in range(0, Mm, block_rows):
+			rows = slice(iM, iM + block_rows)
+			Kk1_inv = Kk1[rows]**-1.0
+			Kk2_inv = Kk2[rows]**-1.0
+			Kk1_sum = np.dot(Kk1_inv, Ss0)
+			Kk2_sum = np.dot(Kk2_inv, Ss0)
+			A0 = 1./(1. + np.exp(eps[rows])*(1 + Kk1_sum)**num_sites/
+						(1 + Kk2_sum)**num_sites)
+			
+			WL_term = num_sites*(Kk1_inv/(1. + Kk1_sum)[:, None] - 
+									Kk2_inv/(1. + Kk2_sum)[:, None])
+			np.multiply((-A0*(1. - A0))[:, None], WL_term, out=out[rows])
 	else:
 		print ('Non-competitive not coded yet')
 		quit()
 			
-	return dAadSs0
+	return out
 	
-def receptor_activity(Ss, Kk1, Kk2, eps, comp=True, num_sites=1):
+def receptor_activity(Ss, Kk1, Kk2, eps, comp=True, num_sites=1, 
+						support=None):
 	"""
 	Steady state activity with binding and activation 
 	Kk2 is the activated disassociation constants (K2)
@@ -55,13 +69,20 @@ def receptor_activity(Ss, Kk1, Kk2, eps, comp=True, num_sites=1):
 	Tranpose in the sums allows for an array of stimuli at once; 
 	Ss array would have shape (Nn, number of stimuli). `comp' sets 
 	whether the binding is competitive or non-competitive. `num_sites' 
-	sets the number of indepdent binding sites per receptor.
+	sets the number of indepdent binding sites per receptor. `support' 
+	optionally lists the indices of the nonzero rows of Ss; only those 
+	columns of Kk1 and Kk2 are then used in the binding sums.
 	"""
 	
+	if support is not None:
+		Kk1 = Kk1[:, support]
+		Kk2 = Kk2[:, support]
+		Ss = Ss[support]
+	
 	if comp == True:
-		Kk1_sum = sp.dot(Kk1**-1.0, Ss)
-		Kk2_sum = sp.dot(Kk2**-1.0, Ss)
-		Aa = (1. + sp.exp(eps.T)*(1 + Kk1_sum.T)**num_sites/
+		Kk1_sum = np.dot(Kk1**-1.0, Ss)
+		Kk2_sum = np.dot(Kk2**-1.0, Ss)
+		Aa = (1. + np.exp(eps.T)*(1 + Kk1_sum.T)**num_sites/
 			 (1 + Kk2_sum.T)**num_sites)**-1.0
 	else:
 		print ('Non-competitive not coded yet')
@@ -69,6 +90,60 @@ def receptor_activity(Ss, Kk1, Kk2, eps, comp=True, num_sites=1):
 		
 	return Aa.T
 
+def activity_and_gain(Ss, Ss0, Kk1, Kk2, eps, comp=True, num_sites=1, 
+						support=None, out=None):
+	"""
+	Activity for a single signal Ss, and background activity and 
+	linearized gain about the background Ss0, computed together. 
+	Equivalent to receptor_activity(Ss, ...), receptor_activity(Ss0, ...) 
+	and linear_gain(Ss0, ...), but the inverse dissociation constants 
+	are computed once and the binding sums for both signals are taken 
+	in a single pass over them.
+	
+	Args:
+		Ss: signal, shape (Nn,).
+		Ss0: background signal, shape (Nn,).
+		Kk1, Kk2: dissociation constants, shape (Mm, Nn).
+		eps: free energies, shape (Mm,).
+		comp: whether binding is competitive.
+		num_sites: number of independent binding sites per receptor.
+		support: optional indices of the nonzero components of Ss and 
+			Ss0, to which the binding sums are restricted.
+		out: optional array of shape (Mm, Nn) to hold the gain.
+		
+	Returns:
+		Aa: signal activity, shape (Mm,).
+		A0: background activity, shape (Mm,).
+		dAadSs0: linearized gain, shape (Mm, Nn).
+	"""
+	
+	if comp == True:
+		Kk1_inv = Kk1**-1.0
+		Kk2_inv = Kk2**-1.0
+		
+		# Rows are the signal and the background
+		signals = np.vstack((Ss, Ss0))
+		if support is None:
+			Kk1_sums = np.dot(signals, Kk1_inv.T)
+			Kk2_sums = np.dot(signals, Kk2_inv.T)
+		else:
+			Kk1_sums = np.dot(signals[:, support], Kk1_inv[:, support].T)
+			Kk2_sums = np.dot(signals[:, support], Kk2_inv[:, support].T)
+		Aa, A0 = (1. + np.exp(eps)*(1 + Kk1_sums)**num_sites/
+				 (1 + Kk2_sums)**num_sites)**-1.0
+		
+		# Gain built up in place; the inverse constants are not needed again
+		Kk1_inv /= (1. + Kk1_sums[1])[:, None]
+		Kk2_inv /= (1. + Kk2_sums[1])[:, None]
+		dAadSs0 = np.subtract(Kk1_inv, Kk2_inv, out=out)
+		dAadSs0 *= num_sites
+		dAadSs0 *= -(A0*(1. - A0))[:, None]
+	else:
+		print ('Non-competitive not coded yet')
+		quit()
+	
+	return Aa, A0, dAadSs0
+
 def temporal_kernel(vec, memory_vec, integration_Tt, kernel_params):
 	"""
 	Apply temporal kernel to current values of activity or gain levels. 
@@ -86,17 +161,17 @@ def temporal_kernel(vec, memory_vec, integration_Tt, kernel_params):
 
 	# Length of memory vector based on signal sampling rate
 	signal_dt = integration_Tt[1] - integration_Tt[0]
-	signal_Tt = sp.linspace(0, kernel_T, int(kernel_T/signal_dt) + 1)
+	signal_Tt = np.linspace(0, kernel_T, int(kernel_T/signal_dt) + 1)
 	memory_vec_len = len(signal_Tt)
 	
 	# Finer mesh for kernel integration, utilizing kernel_dt
-	kernel_Tt = sp.arange(0, kernel_T, kernel_dt)
+	kernel_Tt = np.arange(0, kernel_T, kernel_dt)
 	
 	# Assign memory vector holding past activity levels; replace t = 0 
 	# value with current vector value; roll rest to previous times
 	if memory_vec is None:
-		memory_vec = sp.zeros(vec.shape + (memory_vec_len,))
-	memory_vec = sp.roll(memory_vec, 1)
+		memory_vec = np.zeros(vec.shape + (memory_vec_len,))
+	memory_vec = np.roll(memory_vec, 1)
 	memory_vec[...,0] = vec
 		
 	# Interpolating function to get finer mesh for kernel integration
@@ -109,12 +184,12 @@ def temporal_kernel(vec, memory_vec, integration_Tt, kernel_params):
 				kernel_shape_2, scale=kernel_tau_2))
 	
 	# Apply the filter
-	vec = sp.sum(vec_interped*kernel*kernel_dt, axis=-1)
+	vec = np.sum(vec_interped*kernel*kernel_dt, axis=-1)
 	
 	return vec, memory_vec
 	
 def free_energy(Ss, Kk1, Kk2, adapted_A0, comp=True, num_sites=1, 
-				beta_scaling=0):
+				beta_scaling=0, support=None):
 	"""
 	Adapted steady state free energy for given stimulus level, 
 	disassociation constants, and adapted steady state activity level.
@@ -123,14 +198,21 @@ def free_energy(Ss, Kk1, Kk2, adapted_A0, comp=True, num_sites=1,
 	will have shape (Mm, number of stimuli).  `comp' sets whether the 
 	binding is competitive or non-competitive. `num_sites' sets the 
 	number of binding sites. `beta_scaling' controls degree of breaking
-	WL adaptation, from fully adapted (=0) to not adapted (=1)
+	WL adaptation, from fully adapted (=0) to not adapted (=1). `support'
+	optionally lists the indices of the nonzero rows of Ss, as in 
+	receptor_activity.
 	"""
 	
+	if support is not None:
+		Kk1 = Kk1[:, support]
+		Kk2 = Kk2[:, support]
+		Ss = Ss[support]
+	
 	if comp == True:
-		Kk1_sum = sp.dot(Kk1**-1.0, Ss)
-		Kk2_sum = sp.dot(Kk2**-1.0, Ss)
-		epsilon = sp.log((1.- adapted_A0)/adapted_A0) + \
-					(1 - beta_scaling)*sp.log(
+		Kk1_sum = np.dot(Kk1**-1.0, Ss)
+		Kk2_sum = np.dot(Kk2**-1.0, Ss)
+		epsilon = np.log((1.- adapted_A0)/adapted_A0) + \
+					(1 - beta_scaling)*np.log(
 					(1. + Kk2_sum.T)**num_sites/(1. + Kk1_sum.T)**num_sites)
 	else:
 		print ('Non-competitive not coded yet')
@@ -146,7 +228,7 @@ def Kk2_samples(shape, receptor_activity_mus, receptor_activity_sigmas,
 	"""
 
 	Mm, Nn = shape
-	Kk2 = sp.zeros(shape)
+	Kk2 = np.zeros(shape)
 	
 	assert Mm == len(receptor_activity_mus), \
 			"Mean receptor activity vector dimension != measurement "\
@@ -156,11 +238,11 @@ def Kk2_samples(shape, receptor_activity_mus, receptor_activity_sigmas,
 			"dimension %s" % Mm
 	
 	warnings.filterwarnings('error')
-	sp.random.seed(seed)
+	np.random.seed(seed)
 	
 	print ("Generating Kk2 matrix rows from Gaussian tuning curves...")
 	for iM in range(Mm):
-		print(('\nRow %s..' % iM))
+		print('\nRow %s..' % iM)
 		sample_lower_bnd  = -5000
 		sample_upper_bnd = 5000
 		slack = 0.4
@@ -173,25 +255,25 @@ def Kk2_samples(shape, receptor_activity_mus, receptor_activity_sigmas,
 				Kk2_rv_object = Kk_dist_Gaussian_activity(a=sample_lower_bnd,
 														b=sample_upper_bnd)
 				Kk2[iM, :]  = (Kk2_rv_object.rvs(**args_dict))
-				assert sp.all(Kk2[iM, :] != sample_lower_bnd), \
+				assert np.all(Kk2[iM, :] != sample_lower_bnd), \
 											"Lower bound hit"
-				assert sp.all(Kk2[iM, :] != sample_upper_bnd), \
+				assert np.all(Kk2[iM, :] != sample_upper_bnd), \
 											"Upper bound hit"
-				assert sp.all(Kk2[iM, :] != 0), "zero"
-				assert sp.unique(Kk2[iM, :]).size > int(Nn*0.9), \
+				assert np.all(Kk2[iM, :] != 0), "zero"
+				assert np.unique(Kk2[iM, :]).size > int(Nn*0.9), \
 											 "Many values equal"
 				bounds_too_lax = False				
 			except Warning as e:
 				sample_lower_bnd = sample_lower_bnd*slack
 				sample_upper_bnd = sample_upper_bnd*slack
-				print(('No convergence; bounds --> %s, %s..   ' \
-						% (sample_lower_bnd, sample_upper_bnd)))
+				print('No convergence; bounds --> %s, %s..   ' \
+						% (sample_lower_bnd, sample_upper_bnd))
 				pass
 			except AssertionError as e:
 				sample_lower_bnd = sample_lower_bnd*slack
 				sample_upper_bnd = sample_upper_bnd*slack
-				print(('%s; bounds --> %s, %s..   ' \
-						% (e, sample_lower_bnd, sample_upper_bnd)))
+				print('%s; bounds --> %s, %s..   ' \
+						% (e, sample_lower_bnd, sample_upper_bnd))
 				pass
 		print ('..OK')
 	print ("\nKk2 matrix successfully generated\n")
@@ -206,7 +288,6 @@ def Kk2_eval_normal_activity(shape, receptor_activity_mus,
 	"""
 	
 	Mm, Nn = shape
-	Kk2 = sp.zeros(shape)
 	
 	assert Mm == len(receptor_activity_mus), \
 			"Mean receptor activity vector dimension != measurement "\
@@ -215,13 +296,13 @@ def Kk2_eval_normal_activity(shape, receptor_activity_mus,
 			"St dev receptor activity vector dimension != measurement "\
 			"dimension %s" % Mm
 	
-	C = sp.exp(-eps)*Ss0 
+	C = np.exp(-eps)*Ss0 
 	
-	sp.random.seed(seed)
-	for iM in range(Mm):
-		activity = sp.random.normal(receptor_activity_mus[iM], 
-									receptor_activity_sigmas[iM], Nn)
-		Kk2[iM, :] = (1./activity - 1.)*C
+	# One draw for all rows; same stream as drawing row by row
+	np.random.seed(seed)
+	activity = np.random.normal(np.asarray(receptor_activity_mus)[:, None], 
+						np.asarray(receptor_activity_sigmas)[:, None], shape)
+	Kk2 = (1./activity - 1.)*C
 	
 	return Kk2
 
@@ -234,10 +315,10 @@ def Kk2_eval_uniform_activity(shape, params, Ss0, eps, seed):
 	lo = params[0]
 	hi = params[1]
 	
-	C = sp.exp(-eps)*Ss0 
+	C = np.exp(-eps)*Ss0 
 
-	sp.random.seed(seed)
-	matrix_activity = sp.random.uniform(lo, hi, shape)
+	np.random.seed(seed)
+	matrix_activity = np.random.uniform(lo, hi, shape)
 	Kk2 = (1./matrix_activity - 1.)*C
 	
 	return Kk2
@@ -250,18 +331,17 @@ def Kk2_eval_exponential_activity(shape, receptor_activity_mus,
 	"""
 	
 	Mm, Nn = shape
-	Kk2 = sp.zeros(shape)
 	
 	assert Mm == len(receptor_activity_mus), \
 			"Mean receptor activity vector dimension != measurement "\
 			"dimension %s" % Mm
 	
-	C = sp.exp(-eps)*Ss0 
+	C = np.exp(-eps)*Ss0 
 	
-	sp.random.seed(seed)
-	for iM in range(Mm):
-		activity = sp.random.exponential(receptor_activity_mus[iM], Nn)
-		Kk2[iM, :] = (1./activity - 1.)*C
+	np.random.seed(seed)
+	activity = np.random.exponential(
+						np.asarray(receptor_activity_mus)[:, None], shape)
+	Kk2 = (1./activity - 1.)*C
 	
 	return Kk2
 	
@@ -270,7 +350,7 @@ def inhibitory_normalization(Yy, C, D, eta, R):
 	Add inhibitory divisive normalization.
 	"""
 	
-	total_act = sp.sum(Yy)
+	total_act = np.sum(Yy)
 	Mm = len(Yy)
 	
 	return 1.*R*(Yy**eta)/(Yy**eta + 1.*C/Mm*total_act + D)
@@ -281,15 +361,15 @@ def inhibitory_normalization_linear_gain(Yy0, Rr, C, D, eta, R):
 	"""
 	
 	Mm = len(Yy0)
-	df_da = sp.zeros((Mm, Mm))
-	total_act = sp.sum(Yy0)
-	
-	for iM in range(Mm):	
-		den = (Yy0[iM]**eta + 1.*C/Mm*total_act + D)**2.0
-		df_da[iM, :] = R*(-(Yy0[iM]**eta)*C/Mm)/den
-		df_da[iM, iM] += R*(eta*Yy0[iM]**(eta - 1.0)*(1.*C/Mm*total_act + D))/den
-	
-	df_da_dot_Rr = sp.dot(df_da, Rr)
+	total_act = np.sum(Yy0)
+	norm = 1.*C/Mm*total_act + D
+	den = (Yy0**eta + norm)**2.0
+	
+	# df_da is a diagonal plus a rank-1 term (row iM is constant off the 
+	# diagonal), so apply it to Rr without forming the MxM matrix
+	off_diag = R*(-(Yy0**eta)*C/Mm)/den
+	diag = R*(eta*Yy0**(eta - 1.0)*norm)/den
+	df_da_dot_Rr = diag[:, None]*Rr + off_diag[:, None]*np.sum(Rr, axis=0)
 	
 	return df_da_dot_Rr
 	
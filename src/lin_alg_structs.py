@@ -10,25 +10,31 @@ visit http://creativecommons.org/licenses/by-nc-sa/4.0/.
 """
 
 
-import scipy as sp
+import numpy as np
 from scipy.stats import powerlaw
 
 
-def random_matrix(matrix_shape, params, sample_type='normal', seed=0):
+def random_matrix(matrix_shape, params, sample_type='normal', seed=0, 
+					dtype=None):
 	"""
-	Generate random matrix with given distribution
+	Generate random matrix with given distribution; the samples are
+	drawn in float64 and stored with floating point type dtype, if set.
 	"""
 	
+	if dtype is not None:
+		return random_matrix(matrix_shape, params, sample_type, 
+								seed).astype(dtype, copy=False)
+	
 	if sample_type == 'normal':
-		sp.random.seed(seed)
+		np.random.seed(seed)
 		mean, sigma = params[:2]
 		if sigma != 0.:
-			return sp.random.normal(mean, sigma, matrix_shape)
+			return np.random.normal(mean, sigma, matrix_shape)
 		else:
-			return mean*sp.ones(matrix_shape)
+			return mean*np.ones(matrix_shape)
 	
 	elif sample_type == "rank2_row_gaussian":
-		sp.random.seed(seed)
+		np.random.seed(seed)
 		means, sigmas = params[:2]
 		
 		assert len(matrix_shape) == 2, \
@@ -38,20 +44,18 @@ def random_matrix(matrix_shape, params, sample_type='normal', seed=0):
 										"mu vector of proper length"
 		assert len(sigmas) == nRows, "rank2_row_gaussian needs " \
 										"sigma vector of proper length"
-		out_matrix = sp.zeros(matrix_shape)
 		
-		for iRow in range(nRows):
-			out_matrix[iRow, :] = sp.random.normal(means[iRow], sigmas[iRow], 
-													nCols)
-		return out_matrix
+		# One draw for all rows; same stream as drawing row by row
+		return np.random.normal(np.asarray(means)[:, None], 
+								np.asarray(sigmas)[:, None], matrix_shape)
 	
 	elif sample_type == 'uniform':
-		sp.random.seed(seed)
+		np.random.seed(seed)
 		lo, hi = params[:2]
-		return sp.random.uniform(lo, hi, matrix_shape)
+		return np.random.uniform(lo, hi, matrix_shape)
 	
 	elif sample_type == "rank2_row_uniform":
-		sp.random.seed(seed)
+		np.random.seed(seed)
 		bounds_lo, bounds_hi = params[:2]
 		
 		assert len(matrix_shape) == 2, \
@@ -61,15 +65,12 @@ def random_matrix(matrix_shape, params, sample_type='normal', seed=0):
 										"bounds_lo vector of proper length"
 		assert len(bounds_hi) == nRows, "rank2_row_uniform needs " \
 										"bounds_hi vector of proper length"
-		out_matrix = sp.zeros(matrix_shape)
 		
-		for iRow in range(nRows):
-			out_matrix[iRow, :] = sp.random.uniform(bounds_lo[iRow], 
-									bounds_hi[iRow], nCols)
-		return out_matrix
+		return np.random.uniform(np.asarray(bounds_lo)[:, None], 
+								 np.asarray(bounds_hi)[:, None], matrix_shape)
 	
 	elif sample_type == "rank2_row_power":
-		sp.random.seed(seed)
+		np.random.seed(seed)
 		bounds_lo, bounds_hi, power_exp = params[:3]
 		
 		assert len(matrix_shape) == 2, \
@@ -79,15 +80,13 @@ def random_matrix(matrix_shape, params, sample_type='normal', seed=0):
 										"bounds_lo vector of proper length"
 		assert len(bounds_hi) == nRows, "rank2_row_gaussian needs " \
 										"bounds_hi vector of proper length"
-		out_matrix = sp.zeros(matrix_shape)
 		
-		for iRow in range(nRows):
-			out_matrix[iRow, :] = powerlaw.rvs(power_exp, loc=bounds_lo[iRow], 
-									scale=bounds_hi[iRow], size=nCols)	
-		return out_matrix
+		return powerlaw.rvs(power_exp, loc=np.asarray(bounds_lo)[:, None], 
+							scale=np.asarray(bounds_hi)[:, None], 
+							size=matrix_shape)
 	
 	elif sample_type == 'power':
-		sp.random.seed(seed)
+		np.random.seed(seed)
 		lo, hi, power_exp = params[:3]
 		return powerlaw.rvs(power_exp, loc=lo, scale=hi, size=matrix_shape)	
 	
@@ -95,47 +94,97 @@ def random_matrix(matrix_shape, params, sample_type='normal', seed=0):
 		mean1, sigma1, mean2, sigma2, prob_1 = params[:5]
 		assert prob_1 <= 1., "Gaussian mixture needs p < 1" 
 		
-		sp.random.seed(seed)
-		mixture_idxs = sp.random.binomial(1, prob_1, matrix_shape)
-		it = sp.nditer(mixture_idxs, flags=['multi_index'])
-		out_vec = sp.zeros(matrix_shape)
+		np.random.seed(seed)
+		mixture_idxs = np.random.binomial(1, prob_1, matrix_shape)
 		
-		while not it.finished:
-			if mixture_idxs[it.multi_index] == 1: 
-				out_vec[it.multi_index] = sp.random.normal(mean1, sigma1)
-			else:
-				out_vec[it.multi_index] = sp.random.normal(mean2, sigma2)
-			it.iternext()
+		# One standard normal per element, in the order they were drawn 
+		# element by element, scaled by the statistics of its component
+		normals = np.random.standard_normal(matrix_shape)
 		
-		return out_vec
+		return np.where(mixture_idxs == 1, mean1 + sigma1*normals, 
+						mean2 + sigma2*normals)
 	
 	else:
 		print ('No proper matrix sample_type!')
 		exit()
 
+def row_mixture_matrix(matrix_shape, num_rows_1, params_1, params_2, seed=0):
+	"""
+	Generate random matrix whose first num_rows_1 rows are normal with
+	params_1 = [mean, sigma] and whose remaining rows are normal with 
+	params_2. Both row blocks are drawn from the same seed -- row i of 
+	the second block uses the same standard normals as row i of the 
+	first -- and the global random state is left as after drawing the 
+	second block, exactly as for two separate random_matrix calls.
+	"""
+	
+	nRows, nCols = matrix_shape
+	num_rows_2 = nRows - num_rows_1
+	mean_1, sigma_1 = params_1[:2]
+	mean_2, sigma_2 = params_2[:2]
+	
+	# Draw the normals of the second block; draw any extra rows needed by
+	# the first block after that, then restore the random state
+	np.random.seed(seed)
+	num_draws = num_rows_2*(sigma_2 != 0.)
+	normals = np.random.standard_normal((num_draws, nCols))
+	if (sigma_1 != 0.) and (num_rows_1 > num_draws):
+		random_state = np.random.get_state()
+		extra_normals = np.random.standard_normal((num_rows_1 - num_draws, 
+													nCols))
+		normals = np.vstack((normals, extra_normals))
+		np.random.set_state(random_state)
+	
+	out_matrix = np.empty(matrix_shape)
+	if sigma_1 != 0.:
+		out_matrix[:num_rows_1] = mean_1 + sigma_1*normals[:num_rows_1]
+	else:
+		out_matrix[:num_rows_1] = mean_1
+	if sigma_2 != 0.:
+		out_matrix[num_rows_1:] = mean_2 + sigma_2*normals[:num_rows_2]
+	else:
+		out_matrix[num_rows_1:] = mean_2
+	
+	return out_matrix
+
+def seeded_uniform_matrices(matrix_shape, params_list, seed=0):
+	"""
+	Generate one uniform random matrix for each [lo, hi] in params_list,
+	all from the same seed. This equals a random_matrix call of 
+	sample_type 'uniform' for each, but the uniform samples are drawn 
+	only once and rescaled to each set of bounds; the global random 
+	state is left as after any one of those calls.
+	"""
+	
+	np.random.seed(seed)
+	samples = np.random.random_sample(matrix_shape)
+	
+	return [lo + (hi - lo)*samples for lo, hi in params_list]
+
 def sparse_vector(nDims, params, sample_type='normal', seed=0):
 	"""
 	Set sparse stimulus with given statistics
 	"""
 	
 	Nn, Kk = nDims
-	Ss = sp.zeros(Nn)
+	Ss = np.zeros(Nn)
 	
-	sp.random.seed(seed)
+	# Local generator; the global numpy RNG state is left untouched
+	rng = np.random.RandomState(seed)
 	
-	for iK in range(Kk): 
-		if sample_type == "normal":
-			mu, sigma = params
-			if sigma != 0:
-				Ss[iK] = sp.random.normal(mu, sigma)
-			else:
-				Ss[iK] = mu
-		elif sample_type == "uniform":
-			lo, hi = params
-			Ss[iK] = sp.random.uniform(lo,hi)
+	# All Kk components in one draw; same stream as drawing one by one
+	if sample_type == "normal":
+		mu, sigma = params
+		if sigma != 0:
+			Ss[:Kk] = rng.normal(mu, sigma, Kk)
+		else:
+			Ss[:Kk] = mu
+	elif sample_type == "uniform":
+		lo, hi = params
+		Ss[:Kk] = rng.uniform(lo, hi, Kk)
 	
-	sp.random.shuffle(Ss)
-	idxs = sp.nonzero(Ss)
+	rng.shuffle(Ss)
+	idxs = np.nonzero(Ss)
 	
 	return Ss, idxs
 	
@@ -146,23 +195,24 @@ def sparse_vector_bkgrnd(nDims, idxs, params, sample_type='normal', seed=0):
 	"""
 
 	Nn, Kk = nDims
-	Ss = sp.zeros(Nn)
-	Ss_noisy = sp.zeros(Nn)
+	Ss = np.zeros(Nn)
+	Ss_noisy = np.zeros(Nn)
 	
-	sp.random.seed(seed)
+	# Local generator; the global numpy RNG state is left untouched
+	rng = np.random.RandomState(seed)
 
 	for iK in idxs: 
 		if sample_type == "normal":
 			mu, sigma = params
 			Ss[iK] = mu
 			if sigma != 0:
-				Ss_noisy[iK] += sp.random.normal(mu, sigma)
+				Ss_noisy[iK] += rng.normal(mu, sigma)
 			else:
 				Ss_noisy[iK] += mu
 		elif sample_type == "uniform":
 			lo, hi = params
 			Ss[iK] = lo + (hi - lo)/2.
-			Ss_noisy[iK] += sp.random.uniform(lo, hi)
+			Ss_noisy[iK] += rng.uniform(lo, hi)
 	
 	return Ss, Ss_noisy
 
@@ -172,14 +222,15 @@ def manual_sparse_vector(nDims, idxs, params, seed=0):
 	listed in manual_dSs
 	"""
 	
-	dSs = sp.zeros(nDims)
+	dSs = np.zeros(nDims)
 	mu, sigma = params
 	
-	sp.random.seed(seed)
+	# Local generator; the global numpy RNG state is left untouched
+	rng = np.random.RandomState(seed)
 	
 	for idx, dSs_idx in enumerate(idxs):
 		if sigma != 0:
-			dSs[int(dSs_idx)] = sp.random.normal(mu, sigma) 
+			dSs[int(dSs_idx)] = rng.normal(mu, sigma) 
 		else:
 			dSs[int(dSs_idx)] = mu
 	
@@ -9,7 +9,7 @@ To view a copy of this license,
 visit http://creativecommons.org/licenses/by-nc-sa/4.0/.
 """
 
-import scipy as sp
+import numpy as np
 import pickle
 import shelve
 import gzip
@@ -29,12 +29,12 @@ def load_Hallem_firing_rate_data():
 	"""
 	
 	filename = '%s/Hallem_data/firing_rates.dat' % (DATA_DIR)
-	data = sp.loadtxt(filename, dtype='S8')
-	unicode_data = data.view(sp.chararray).encode('utf-8')
+	data = np.loadtxt(filename, dtype='S8')
+	unicode_data = data.view(np.chararray).encode('utf-8')
 		
 	data_dict = dict()
 	ORN_names = data[0, :]
-	ORN_rates = sp.array(data[1:, :], dtype='float').T
+	ORN_rates = np.array(data[1:, :], dtype='float').T
 	for idx, name in enumerate(ORN_names): 
 		data_dict[name] = (ORN_rates[idx])
 	
@@ -73,10 +73,38 @@ def load_aggregated_object_list(iter_vars_dims, data_flag):
 	with gzip.open(filename, 'rb') as f:
 		CS_object_list = pickle.load(f)
 	
-	CS_object_array = sp.reshape(CS_object_list, iter_vars_dims)
+	CS_object_array = np.reshape(CS_object_list, iter_vars_dims)
 
 	return CS_object_array
 
+def load_aggregated_arrays(data_flag, structs_to_load=None, mmap_mode='r'):
+	"""
+	Load arrays saved by save_aggregated_arrays; arrays are memory-mapped
+	by default, so only the slices that are indexed are read from disk.
+
+	Args:
+		data_flag: Data identifier for loading and saving.
+		structs_to_load: list of attribute names to load; if None, load 
+			all saved attributes.
+		mmap_mode: memory-map mode passed to load; None reads arrays fully.
+	
+	Returns:
+		data_dict: dictionary of arrays, each of shape (iterated var ranges,
+			variable shape).
+	"""
+
+	in_dir = '%s/objects/%s/aggregated_arrays' % (DATA_DIR, data_flag)
+	if structs_to_load is None:
+		structs_to_load = [filename[:-4] for filename in os.listdir(in_dir)
+							if filename.endswith('.npy')]
+	
+	data_dict = dict()
+	for struct_name in structs_to_load:
+		data_dict[struct_name] = np.load('%s/%s.npy' % (in_dir, struct_name), 
+											mmap_mode=mmap_mode)
+	
+	return data_dict
+
 def load_MSE_errors(data_flag):
 	"""
 	Load .npz file containing error data.
@@ -90,7 +118,7 @@ def load_MSE_errors(data_flag):
 
 	filename = '%s/analysis/%s/MSE_errors.npz' % (DATA_DIR, data_flag)
 	errors = dict()
-	infile = sp.load(filename)
+	infile = np.load(filename)
 	errors['errors_nonzero'] = infile['errors_nonzero']
 	errors['errors_zero'] = infile['errors_zero']
 	
@@ -109,7 +137,7 @@ def load_binary_errors(data_flag):
 	
 	filename = '%s/analysis/%s/binary_errors.npz' % (DATA_DIR, data_flag)
 	errors = dict()
-	infile = sp.load(filename)
+	infile = np.load(filename)
 	errors['errors_nonzero'] = infile['errors_nonzero']
 	errors['errors_zero'] = infile['errors_zero']
 	
@@ -128,7 +156,7 @@ def load_binary_errors_dual_odor(data_flag):
 	
 	filename = '%s/analysis/%s/binary_errors.npz' % (DATA_DIR, data_flag)
 	errors = dict()
-	infile = sp.load(filename)
+	infile = np.load(filename)
 	errors['errors_nonzero'] = infile['errors_nonzero']
 	errors['errors_nonzero_2'] = infile['errors_nonzero_2']
 	errors['errors_zero'] = infile['errors_zero']
@@ -148,7 +176,7 @@ def load_success_ratios(data_flag):
 	"""
 	
 	filename = '%s/analysis/%s/successes.npz' % (DATA_DIR, data_flag)
-	infile = sp.load(filename)
+	infile = np.load(filename)
 	successes = infile['successes']
 	
 	return successes
@@ -161,7 +189,7 @@ def load_signal_trace_from_file(file):
 	
 	filename = '%s/signal_traces/%s.dat' % (DATA_DIR, file)
 	
-	signal_trace = sp.loadtxt(filename, dtype=float)
+	signal_trace = np.loadtxt(filename, dtype=float)
 	
 	return signal_trace
 	
@@ -9,12 +9,17 @@ To view a copy of this license,
 visit http://creativecommons.org/licenses/by-nc-sa/4.0/.
 """
 
-import scipy as sp
+import numpy as np
 import os
 from collections import OrderedDict
+from functools import lru_cache
 from local_methods import def_data_dir
 from utils import merge_two_dicts
 
+# Relative variable rules are evaluated in this namespace; older specs 
+# files write them with scipy functions.
+import scipy as sp
+
 data_dir = def_data_dir()
 
 def read_specs_file(data_flag, data_dir = data_dir):
@@ -57,53 +62,54 @@ def read_specs_file(data_flag, data_dir = data_dir):
 	except:
 		print("There is no input file %s/specs/%s.txt" % (data_dir, data_flag))
 		exit()
-	specs_file = open(filename, 'r')
-
+	
+	# Read the file once, bucketing the split lines by variable type
+	var_types = ('iter_var', 'fixed_var', 'rel_var', 'param', 'run_spec')
+	lines_by_type = dict((var_type, []) for var_type in var_types)
+	with open(filename, 'r') as specs_file:
+		for line_number, line in enumerate(specs_file, 1):
+			if line.strip() and not line.startswith("#"):
+				keys = line.split()
+				if keys[0] not in lines_by_type:
+					print("Unidentified input on line %s of %s.txt: %s" 
+							%(line_number, data_flag, line))
+					quit()
+				lines_by_type[keys[0]].append(keys)
+	
 	fixed_vars = dict()
 	iter_vars = OrderedDict()
 	rel_vars = dict()
 	params = dict()
 	run_specs = dict()
 	
-	line_number = 0
-	for line in specs_file:
-		line_number += 1
-		if line.strip():
-			if not line.startswith("#"):
-				keys = line.split()
-				var_type = keys[0]
-				if var_type == 'iter_var':
-					var_name = keys[1]
-					scaling = str(keys[2])
-					lo = float(keys[3])
-					hi = float(keys[4])
-					Nn = int(keys[5])
-					if scaling == 'lin':
-						iter_vars[var_name] = sp.linspace(lo, hi, Nn)
-					elif scaling == 'exp':
-						base = float(keys[6])
-						iter_vars[var_name] = base**sp.linspace(lo, hi, Nn)
-				elif var_type == 'fixed_var':
-					var_name = keys[1]
-					try:
-						fixed_vars[var_name] = float(keys[2])
-					except ValueError:
-						fixed_vars[var_name] = str(keys[2])
-				elif var_type == 'rel_var':
-					var_name = keys[1]
-					rel_vars[var_name] = str(keys[2])
-				elif var_type == 'param':
-					var_name = keys[1]
-					params[var_name] = int(keys[2])
-				elif var_type == 'run_spec':
-					var_name = keys[1]
-					run_specs[var_name] = keys[2:]
-				else:
-					print("Unidentified input on line %s of %s.txt: %s" 
-							%(line_number, data_flag, line))
-					quit()
-		
-	specs_file.close()
+	# Convert the numeric columns of the iterated variables together
+	iter_lines = lines_by_type['iter_var']
+	bounds = np.array([keys[3:5] for keys in iter_lines], dtype=float)
+	for keys, (lo, hi) in zip(iter_lines, bounds):
+		var_name = keys[1]
+		scaling = keys[2]
+		Nn = int(keys[5])
+		if scaling == 'lin':
+			iter_vars[var_name] = np.linspace(lo, hi, Nn)
+		elif scaling == 'exp':
+			base = float(keys[6])
+			iter_vars[var_name] = base**np.linspace(lo, hi, Nn)
+	
+	for keys in lines_by_type['fixed_var']:
+		try:
+			fixed_vars[keys[1]] = float(keys[2])
+		except ValueError:
+			fixed_vars[keys[1]] = keys[2]
+	
+	for keys in lines_by_type['rel_var']:
+		rel_vars[keys[1]] = keys[2]
+	
+	for keys in lines_by_type['param']:
+		params[keys[1]] = int(keys[2])
+	
+	for keys in lines_by_type['run_spec']:
+		run_specs[keys[1]] = keys[2:]
+	
 	print('\n -- Input vars and params loaded from %s.txt\n' % data_flag)
 	
 	list_dict =  dict()
@@ -140,13 +146,37 @@ def parse_iterated_vars(iter_vars, iter_vars_idxs, vars_to_pass):
 	
 	print (' -- Running iterated variables with values:\n')
 	
-	for i_sys_arg, iter_var in enumerate(iter_vars.keys()):
-		idx = iter_vars_idxs[i_sys_arg]
-		vars_to_pass[iter_var] = iter_vars[iter_var][idx]
+	for (iter_var, iter_var_range), idx in zip(iter_vars.items(), 
+												iter_vars_idxs):
+		vars_to_pass[iter_var] = iter_var_range[int(idx)]
 		print('%s    \t = %s' %  (iter_var, vars_to_pass[iter_var]))
 	
 	return vars_to_pass
 	
+@lru_cache(maxsize=None)
+def compile_relative_rule(var_rule, iter_var_names):
+	"""
+	Compile the rule of a relative variable once, for evaluation in each
+	run of a sweep. Iterated variables appear in the rule as names, which 
+	are bound to their values when the compiled rule is evaluated.
+	
+	Args:
+		var_rule: String expressing the dependence of a relative variable 
+					on iterated variables, using numpy syntax.
+		iter_var_names: Tuple of the names of all iterated variables.
+		
+	Returns:
+		rule_code: Code object of the compiled rule.
+		rule_vars: Tuple of the names of the iterated variables referenced
+					in the rule.
+	"""
+	
+	rule_code = compile(var_rule, '<rel_var>', 'eval')
+	rule_vars = tuple(iter_var for iter_var in iter_var_names 
+						if iter_var in rule_code.co_names)
+	
+	return rule_code, rule_vars
+	
 def parse_relative_vars(rel_vars, iter_vars, vars_to_pass):
 	"""
 	Parse the relatively-defined vriables from a dictionary to pass to 
@@ -166,22 +196,17 @@ def parse_relative_vars(rel_vars, iter_vars, vars_to_pass):
 	
 	print ('\n -- Variables relative to others:\n')
 	
-	for rel_var, var_rule in list(rel_vars.items()):
+	iter_var_names = tuple(iter_vars)
+	for rel_var, var_rule in rel_vars.items():
 		assert rel_var not in iter_vars, 'Relative variable %s is already '\
 												'being iterated' % rel_var
-		flag = False
-		for iter_var in list(iter_vars.keys()):
-			if iter_var in var_rule:
-				flag = True
-				tmp_str = var_rule.replace(iter_var, '%s' 
-							% vars_to_pass[iter_var])
-				vars_to_pass[rel_var] = eval(tmp_str)
-				break
-			else:
-				continue
-				
-		assert flag == True, 'Assignment %s <-- %s does not depend on any '\
-							'iterated variables' % (rel_var, var_rule)	
+		rule_code, rule_vars = compile_relative_rule(var_rule, 
+									iter_var_names)
+		assert len(rule_vars) > 0, 'Assignment %s <-- %s does not depend '\
+							'on any iterated variables' % (rel_var, var_rule)	
+		vars_to_pass[rel_var] = eval(rule_code, globals(), 
+							dict((iter_var, vars_to_pass[iter_var]) 
+							for iter_var in rule_vars))
 
 		print('%s = %s <-- %s' % (var_rule, vars_to_pass[rel_var], rel_var))
 
@@ -214,4 +239,94 @@ def compile_all_run_vars(list_dict, iter_var_idxs):
 	vars_to_pass = merge_two_dicts(vars_to_pass, list_dict['fixed_vars'])
 	vars_to_pass = merge_two_dicts(vars_to_pass, list_dict['params'])
 	
-	return vars_to_pass
\ No newline at end of file
+	return vars_to_pass
+	
+def parse_iterated_vars_batch(iter_vars):
+	"""
+	Parse the iterated variables for every run of the sweep at once. The
+	full ranges are expanded over the cartesian grid of iterated variable
+	indices, in the order of np.ndindex over the range lengths.
+	
+	Args:
+		iter_vars: Dictionary of iterated variables and full ranges.
+		
+	Returns:
+		batch_vars: Ordered dictionary with the same keys as iter_vars; each 
+						value is a flat array holding the value of that 
+						iterated variable in each run of the sweep.
+	"""
+	
+	grids = np.meshgrid(*iter_vars.values(), indexing='ij')
+	batch_vars = OrderedDict()
+	for iter_var, grid in zip(iter_vars.keys(), grids):
+		batch_vars[iter_var] = grid.ravel()
+	
+	return batch_vars
+
+def parse_relative_vars_batch(rel_vars, iter_vars, batch_vars):
+	"""
+	Parse the relatively-defined variables for every run of the sweep at 
+	once; each rule is evaluated a single time over the array of values 
+	of the iterated variable it depends on.
+	
+	Args:
+		rel_vars: Dictionary of relative variables and values, as in 
+					parse_relative_vars.
+		iter_vars: Dictionary of iterated variables. 
+		batch_vars: Dictionary of arrays of iterated variable values per
+					run, from parse_iterated_vars_batch.
+		
+	Returns:
+		batch_vars: Same dictionary, now updated with arrays of the 
+					relative variables.
+	"""	
+	
+	iter_var_names = tuple(iter_vars)
+	for rel_var, var_rule in rel_vars.items():
+		assert rel_var not in iter_vars, 'Relative variable %s is already '\
+												'being iterated' % rel_var
+		rule_code, rule_vars = compile_relative_rule(var_rule, 
+									iter_var_names)
+		assert len(rule_vars) > 0, 'Assignment %s <-- %s does not depend '\
+							'on any iterated variables' % (rel_var, var_rule)	
+		batch_vars[rel_var] = np.broadcast_to(eval(rule_code, globals(), 
+							dict((iter_var, batch_vars[iter_var]) 
+							for iter_var in rule_vars)), 
+							batch_vars[rule_vars[0]].shape)
+
+	return batch_vars
+	
+def compile_all_run_vars_batch(list_dict):
+	"""
+	Aggregate the run variables of every run of the sweep, as 
+	compile_all_run_vars does for a single run, parsing the iterated and
+	relative variables for the whole sweep at once.
+	
+	Args:
+		list_dict: dictionary containing 5 keys; iter_vars, rel_vars, 
+			iter_vars, fixed_vars, params, and run_specs. These are read 
+			through read_specs_file(...) function in this module.
+			
+	Returns:
+		vars_to_pass_list: list of dictionaries, one per run in the order 
+			of np.ndindex over the iterated variable range lengths, of the 
+			variables to be overriden in the four_state_receptor class.
+	"""
+	
+	batch_vars = parse_iterated_vars_batch(list_dict['iter_vars'])
+	batch_vars = parse_relative_vars_batch(list_dict['rel_vars'], 
+						list_dict['iter_vars'], batch_vars)
+	shared_vars = merge_two_dicts(list_dict['fixed_vars'], 
+						list_dict['params'])
+	
+	num_runs = int(np.prod([len(values) for values in 
+						list_dict['iter_vars'].values()]))
+	vars_to_pass_list = []
+	for iRun in range(num_runs):
+		vars_to_pass = dict()
+		for var, values in batch_vars.items():
+			vars_to_pass[var] = values[iRun]
+		vars_to_pass = merge_two_dicts(vars_to_pass, shared_vars)
+		vars_to_pass_list.append(vars_to_pass)
+	
+	return vars_to_pass_list
@@ -10,7 +10,7 @@ To view a copy of this license,
 visit http://creativecommons.org/licenses/by-nc-sa/4.0/.
 """
 
-import scipy as sp
+import numpy as np
 import tensorflow as tf
 import os
 os.environ['TF_CPP_MIN_LOG_LEVEL'] = '2'
@@ -20,12 +20,12 @@ from utils import tf_set_train_test_idxs
 from local_methods import def_data_dir
 
 DATA_DIR = def_data_dir()
-INT_PARAMS = ['Nn', 'Kk', 'Mm', 'seed_Ss0', 'seed_dSs', 'seed_Kk1', 
-				'seed_Kk2', 'seed_receptor_activity', 'Kk_split', 
+INT_PARAMS = frozenset(['Nn', 'Kk', 'Mm', 'seed_Ss0', 'seed_dSs', 
+				'seed_Kk1', 'seed_Kk2', 'seed_receptor_activity', 'Kk_split', 
 				'Kk_1', 'Kk_2', 'Jj_mask_seed', 'num_signals', 
 				'tf_num_classes', 'tf_num_trains', 'tf_max_steps', 
-				'Zz', 'Zz_sparse', 'num_tf_ckpts']
-EVAL_PARAMS = ['mu_dSs_array']
+				'Zz', 'Zz_sparse', 'num_tf_ckpts'])
+EVAL_PARAMS = frozenset(['mu_dSs_array'])
 
 class nn(four_state_receptor_CS):
 	"""
@@ -46,7 +46,7 @@ class nn(four_state_receptor_CS):
 		# classification. mu_dSs_2 is set same as mu_dSs, chosen from array.
 		self.Kk_1 = 1
 		self.Kk_2 = 1
-		self.mu_dSs_array = sp.logspace(0, 4, 10)
+		self.mu_dSs_array = np.logspace(0, 4, 10)
 		self.num_signals = 100
 		self.sigma_dSs = 0
 		self.sigma_dSs_2 = 0
@@ -94,24 +94,26 @@ class nn(four_state_receptor_CS):
 				quit()
 			
 			if key in INT_PARAMS:
-				exec ('self.%s = int(kwargs[key])' % key)
+				setattr(self, key, int(kwargs[key]))
 			elif key in EVAL_PARAMS:
-				exec ('self.%s = eval(kwargs[key])' % key)	
+				setattr(self, key, eval(kwargs[key]))
 			else:
-				exec ('self.%s = kwargs[key]' % key)
+				setattr(self, key, kwargs[key])
+		
+		self._matrix_shape = (self.Mm, self.Nn)
 		
 	def init_nn_frontend(self):
 		"""
 		Initialize the signal array and free energies of receptor complexes
 		"""
 		
-		signal_array = sp.zeros((self.Nn, self.num_signals, 
+		signal_array = np.zeros((self.Nn, self.num_signals, 
 								len(self.mu_dSs_array)))
-		eps_array = sp.zeros((self.Mm, self.num_signals, 
+		eps_array = np.zeros((self.Mm, self.num_signals, 
 								len(self.mu_dSs_array)))
 	
 		# Iterate to get signal and energy in [# odor IDs, # odor concs]
-		it = sp.nditer(signal_array[0,...], flags=['multi_index'])
+		it = np.nditer(signal_array[0,...], flags=['multi_index'])
 		while not it.finished:
 			
 			self.seed_dSs = it.multi_index[0]
@@ -132,8 +134,8 @@ class nn(four_state_receptor_CS):
 		
 		# Flattened with inner loop being concentration, outer loop being ID
 		# Full shape is ((# concs)*(# IDs), Nn or Mm)
-		self.Ss = sp.reshape(signal_array, (self.Nn, -1))
-		self.eps = sp.reshape(eps_array, (self.Mm, -1))
+		self.Ss = np.reshape(signal_array, (self.Nn, -1))
+		self.eps = np.reshape(eps_array, (self.Mm, -1))
 	
 	def init_nn_frontend_adapted(self):
 		"""
@@ -141,13 +143,13 @@ class nn(four_state_receptor_CS):
 		for a system that adapts its response to a background signal.
 		"""
 		
-		signal_array = sp.zeros((self.Nn, self.num_signals, 
+		signal_array = np.zeros((self.Nn, self.num_signals, 
 								len(self.mu_dSs_array)))
-		eps_array = sp.zeros((self.Mm, self.num_signals, 
+		eps_array = np.zeros((self.Mm, self.num_signals, 
 								len(self.mu_dSs_array)))
 	
 		# Iterate to get signal and energy in [# odor IDs, # odor concs]
-		it = sp.nditer(signal_array[0,...], flags=['multi_index'])
+		it = np.nditer(signal_array[0,...], flags=['multi_index'])
 		while not it.finished:
 			
 			self.seed_dSs = it.multi_index[0]
@@ -174,8 +176,8 @@ class nn(four_state_receptor_CS):
 	
 		# Signal array shape = (odor-D, (# odor IDs)*(# odor intensities))
 		# Flattened -- inner loop is concentration, outer loop is ID
-		self.Ss = sp.reshape(signal_array, (self.Nn, -1))
-		self.eps = sp.reshape(eps_array, (self.Mm, -1))
+		self.Ss = np.reshape(signal_array, (self.Nn, -1))
+		self.eps = np.reshape(eps_array, (self.Mm, -1))
 	
 	def set_ORN_response_array(self):
 		"""
@@ -185,7 +187,7 @@ class nn(four_state_receptor_CS):
 		self.Yy = receptor_activity(self.Ss, self.Kk1, 
 									self.Kk2, self.eps)
 		self.Yy *= self.NL_scale*(self.Yy > self.NL_threshold)
-		self.Yy = sp.minimum(self.Yy, self.firing_max)
+		self.Yy = np.minimum(self.Yy, self.firing_max)
 	
 	def set_PN_response_array(self):
 		"""
@@ -199,7 +201,7 @@ class nn(four_state_receptor_CS):
 			self.Yy_PN = self.Yy_PN_max*self.Yy**(1.5)/(self.Yy**1.5 
 							+ self.Yy_PN_ff**1.5)
 		elif self.Yy_PN_nonlinearity == 'FF_LI':
-			s_ORN = sp.sum(self.Yy, axis=0)
+			s_ORN = np.sum(self.Yy, axis=0)
 			self.Yy_PN = self.Yy_PN_max*self.Yy**(1.5)/(self.Yy**1.5 
 							+ self.Yy_PN_ff**1.5 + (self.Yy_PN_LI*s_ORN)**1.5)
 		else:
@@ -212,10 +214,10 @@ class nn(four_state_receptor_CS):
 		Set the connection topology -- this is not mutable during training.
 		"""
 		
-		self.Jj_mask = sp.zeros((self.Mm, self.Zz))
-		sp.random.seed(self.Jj_mask_seed)
+		self.Jj_mask = np.zeros((self.Mm, self.Zz))
+		np.random.seed(self.Jj_mask_seed)
 		for iZ in range(self.Zz):
-			idxs = sp.random.choice(range(self.Mm), self.Zz_sparse, replace=0)
+			idxs = np.random.choice(range(self.Mm), self.Zz_sparse, replace=0)
 			self.Jj_mask[idxs, iZ] = 1
 		
 	def init_tf(self):
@@ -233,12 +235,12 @@ class nn(four_state_receptor_CS):
 		
 		# AL --> MB (Mm ORNs to Zz KCs) up to user if can be trained or not
 		self.tf_J1 = tf.Variable(tf.random_normal(shape=[self.Mm, self.Zz], 
-				mean=0., stddev=1./sp.sqrt(self.Zz_sparse)), 
+				mean=0., stddev=1./np.sqrt(self.Zz_sparse)), 
 				trainable=self.tf_AL_MB_trainable)
 		
 		# MB --> readout (Zz KCs to num_classes) can be adjusted in training
 		self.tf_J2 = tf.Variable(tf.random_normal(shape=[self.Zz, 
-						self.tf_num_classes], mean=0, stddev=1./sp.sqrt(self.Zz)),
+						self.tf_num_classes], mean=0, stddev=1./np.sqrt(self.Zz)),
 						trainable=self.tf_MB_read_trainable)
 
 		# MB--> read connections can be adjusted in training
@@ -265,7 +267,7 @@ class nn(four_state_receptor_CS):
 		"""
 	
 		num_concs = len(self.mu_dSs_array)
-		tmp_labels = sp.zeros((self.num_signals, self.tf_num_classes))
+		tmp_labels = np.zeros((self.num_signals, self.tf_num_classes))
 		for iS in range(self.num_signals):
 		
 			# Consecutive signals get consecutive class names. Set 
@@ -274,7 +276,7 @@ class nn(four_state_receptor_CS):
 			tmp_labels[iS, iS % self.tf_num_classes] = 1
 		
 		# Labels are same for different concentrations of a given odor ID
-		self.labels = sp.repeat(tmp_labels, num_concs, axis=0)
+		self.labels = np.repeat(tmp_labels, num_concs, axis=0)
 		
 		# Split indices into training and testing sets
 		train_idxs, test_idxs = tf_set_train_test_idxs(num_concs, 
@@ -297,7 +299,7 @@ class nn(four_state_receptor_CS):
 		saver = tf.train.Saver(max_to_keep=self.num_tf_ckpts)
 	
 		# Train and calculate tf_accuracy at each training step.
-		self.accuracies = sp.zeros(self.tf_max_steps)
+		self.accuracies = np.zeros(self.tf_max_steps)
 		
 		print ("Training and testing network...\n")
 		for iStep in range(self.tf_max_steps):
@@ -330,7 +332,7 @@ class nn(four_state_receptor_CS):
 		vars_to_del = []
 		for var in vars(self):
 			if "tf_" in var:
-				vars_to_del.append('self.%s' % var)
+				vars_to_del.append(var)
 		for var in vars_to_del:
-			exec("del %s" % var)
+			delattr(self, var)
 		
\ No newline at end of file
@@ -10,50 +10,358 @@ To view a copy of this license,
 visit http://creativecommons.org/licenses/by-nc-sa/4.0/.
 """
 
-import scipy as sp
-from scipy.optimize import minimize
+import numpy as np
+from scipy import sparse
+from scipy.sparse.linalg import lsmr
+from scipy.optimize import minimize, linprog
+from scipy.linalg import solve_triangular, cho_solve, svdvals
+
+
+_OMP_BUFFERS = dict()
+
+# Solver for the basis pursuit linear program in decode_LP
+LINPROG_METHOD = 'interior-point'
+
+# Decoders that use a scipy sparse measurement matrix as is
+SPARSE_OPT_TYPES = ('L1_weak', 'LSMR')
 
 
 def decode_CS(Rr, Yy, opt_type="L1_strong", precision='None', 
-				init_params=[0, 1]):
+				init_params=[0, 1], num_nonzero=None, warm_start=None, 
+				gram=None):
 	"""
 	Run CS decoding with L1 norm.
 	
 	Args:
-		Rr: numpy array; measurement matrix.
+		Rr: numpy array; measurement matrix. May be a scipy sparse 
+			matrix (see thresholded_csr), which is used as is by the 
+			decoders in SPARSE_OPT_TYPES and densified otherwise.
 		Yy: numpy array; Measured signal.
 	
 	Optional args:
-		opt_type: String for type of L1 minimization "L1_strong" or "L1_weak".
+		opt_type: String for type of sparse decoding; "L1_strong" (SLSQP with 
+			equality constraint), "L1_LP" (the same problem as a linear 
+			program), "L1_weak" (FISTA), "OMP" (orthogonal matching 
+			pursuit), or "LSMR" (minimum norm least squares; not sparse, 
+			but a fast baseline).
 		precision: Float, for L1_weak, the multiplier of the squared error.
 		init_params: List; initialization point for the optimization.
+		num_nonzero: Int, for OMP, the number of components to select.
+		warm_start: numpy array; initial iterate, e.g. the estimate from a
+			previous, similar problem. If None, L1_strong is initialized 
+			randomly from init_params and L1_weak from zero.
+		gram: numpy array; for OMP, a precomputed Gram matrix Rr^T Rr, 
+			e.g. reused from a previous timestep with nearly the same Rr.
 	"""		
 
 	def L1_strong(x):
-		return sp.sum(abs(x))
-
-	def L1_weak(x,*args):
-		Rr, Yy, precision = args
-		tmp1 = sp.sum(abs(x))
-		tmp2 = precision*sp.sum((sp.dot(Rr, x) - Yy)**2.0)
-		return tmp1+tmp2
+		return np.sum(abs(x))
+	
+	def L1_strong_jac(x):
+		return np.sign(x)
 
-	Nn = len(Rr[0,:])
+	if sparse.issparse(Rr) and opt_type not in SPARSE_OPT_TYPES:
+		Rr = Rr.toarray()
+	
+	Nn = Rr.shape[1]
 	
 	if opt_type == "L1_strong":
-		constraints = ({'type': 'eq', 'fun': lambda x: sp.dot(Rr, x) - Yy})
-		res = minimize(L1_strong, 
-						sp.random.normal(init_params[0], init_params[1], Nn), 
-						method='SLSQP', constraints = constraints)
+		if warm_start is None:
+			x0 = np.random.normal(init_params[0], init_params[1], Nn)
+		else:
+			x0 = warm_start
+		# Analytic gradients; the constraint is linear with Jacobian Rr
+		constraints = ({'type': 'eq', 'fun': lambda x: np.dot(Rr, x) - Yy, 
+						'jac': lambda x: Rr})
+		res = minimize(L1_strong, x0, method='SLSQP', jac=L1_strong_jac, 
+						constraints = constraints)
+		return res.x
+	elif opt_type == "L1_LP":
+		return decode_LP(Rr, Yy)
 	elif opt_type == "L1_weak":
-		res = minimize(L1_weak, 
-						sp.random.normal(init_params[0], init_params[1], Nn), 
-						args = (Rr, Yy, precision), method='SLSQP')
+		return decode_FISTA(Rr, Yy, precision, x0=warm_start)
+	elif opt_type == "OMP":
+		assert num_nonzero is not None, "OMP decoding needs num_nonzero"
+		return decode_OMP(Rr, Yy, num_nonzero, gram=gram)
+	elif opt_type == "LSMR":
+		return decode_LSMR(Rr, Yy, x0=warm_start)
+	else:
+		print ('Unknown optimization type %s' % opt_type)
+		quit()
+
+def _OMP_buffers(Nn, num_nonzero):
+	"""
+	Work arrays for decode_OMP, allocated once per problem shape and 
+	reused; sweeps decode many problems of the same (Nn, num_nonzero).
+	Only the lower triangle of the Cholesky buffer is ever read, so 
+	stale values from earlier decodes are harmless.
+	"""
+	
+	key = (Nn, num_nonzero)
+	if key not in _OMP_BUFFERS:
+		_OMP_BUFFERS[key] = (np.empty((num_nonzero, num_nonzero)), 
+								np.empty((num_nonzero, Nn)), 
+								np.empty(num_nonzero), np.empty(Nn))
+	
+	return _OMP_BUFFERS[key]
+
+def decode_OMP(Rr, Yy, num_nonzero, tol=1e-12, gram=None):
+	"""
+	Greedy sparse decoding by orthogonal matching pursuit. The Gram 
+	matrix Rr^T Rr and the correlations Rr^T Yy are computed once; the
+	least squares problem on the selected components is solved through
+	a Cholesky factor that is extended by one row per selection.
+	
+	Args:
+		Rr: numpy array; measurement matrix.
+		Yy: numpy array; Measured signal.
+		num_nonzero: Int; maximum number of nonzero components.
+	
+	Optional args:
+		tol: Float; stop when the largest residual correlation falls 
+			below this value.
+		gram: numpy array; precomputed Rr^T Rr. Computed here if None.
+	"""
+	
+	Nn = Rr.shape[1]
+	num_nonzero = min(int(num_nonzero), Nn, Rr.shape[0])
+	
+	if gram is None:
+		gram = np.dot(Rr.T, Rr)
+	corr_init = np.dot(Rr.T, Yy)
+	corr = corr_init.copy()
+	
+	# Columns are compared by normalized correlation with the residual
+	col_norms = np.sqrt(np.diag(gram))
+	col_norms[col_norms == 0] = 1.
+	
+	# Selected rows of gram (= columns, by symmetry) and of corr_init are 
+	# kept contiguous, so updates need no fancy-indexed gathers
+	chol, gram_sel, corr_sel, score = _OMP_buffers(Nn, num_nonzero)
+	idxs = []
+	x_sel = np.zeros(0)
+	for iK in range(num_nonzero):
+		np.absolute(corr, out=score)
+		score /= col_norms
+		idx = np.argmax(score)
+		if abs(corr[idx]) < tol:
+			break
+		
+		# Extend the Cholesky factor of gram[idxs, idxs] by one row
+		if iK == 0:
+			chol[0, 0] = np.sqrt(gram[idx, idx])
+		else:
+			row = solve_triangular(chol[:iK, :iK], gram_sel[:iK, idx], 
+									lower=True, check_finite=False)
+			diag_sq = gram[idx, idx] - np.dot(row, row)
+			if diag_sq <= tol:
+				break
+			chol[iK, :iK] = row
+			chol[iK, iK] = np.sqrt(diag_sq)
+		idxs.append(idx)
+		gram_sel[iK] = gram[idx]
+		corr_sel[iK] = corr_init[idx]
+		
+		x_sel = cho_solve((chol[:iK + 1, :iK + 1], True), corr_sel[:iK + 1], 
+							check_finite=False)
+		corr = corr_init - np.dot(x_sel, gram_sel[:iK + 1])
+	
+	x = np.zeros(Nn)
+	x[idxs] = x_sel
+	
+	return x
+
+def decode_OMP_batch(Rr, Yy, num_nonzero, tol=1e-12):
+	"""
+	Orthogonal matching pursuit for a stack of independent problems, such
+	as all timesteps of a temporal run. Each greedy step selects one 
+	component for every problem at once, and the least squares problems 
+	on the selected components are solved as one batch.
+	
+	Args:
+		Rr: numpy array of shape (num problems, M, N); measurement matrices.
+		Yy: numpy array of shape (num problems, M); measured signals.
+		num_nonzero: Int; maximum number of nonzero components.
+	
+	Optional args:
+		tol: Float; a problem stops selecting components when its largest
+			residual correlation falls below this value.
+	
+	Returns:
+		x: numpy array of shape (num problems, N); the estimates.
+	"""
+	
+	num_probs, Mm, Nn = Rr.shape
+	num_nonzero = min(int(num_nonzero), Nn, Mm)
+	prob_idxs = np.arange(num_probs)
+	
+	# Columns are compared by normalized correlation with the residual
+	col_norms = np.sqrt(np.einsum('pmn,pmn->pn', Rr, Rr))
+	col_norms[col_norms == 0] = 1.
+	
+	idxs = np.zeros((num_probs, num_nonzero), dtype=int)
+	num_sel = np.zeros(num_probs, dtype=int)
+	x_sel = np.zeros((num_probs, num_nonzero))
+	active = np.ones(num_probs, dtype=bool)
+	resid = np.array(Yy, dtype=float)
+	for iK in range(num_nonzero):
+		corr = np.einsum('pmn,pm->pn', Rr, resid)
+		score = abs(corr)/col_norms
+		score[prob_idxs[:, None], idxs[:, :iK]] = -1
+		idx = np.argmax(score, axis=1)
+		active *= abs(corr[prob_idxs, idx]) >= tol
+		if not np.any(active):
+			break
+		idxs[active, iK] = idx[active]
+		num_sel[active] += 1
+		
+		# Least squares on the selected columns of the active problems
+		act_idxs = prob_idxs[active]
+		Rr_sel = Rr[act_idxs[:, None, None], np.arange(Mm)[None, :, None], 
+					idxs[act_idxs, None, :iK + 1]]
+		gram_sel = np.einsum('pmi,pmj->pij', Rr_sel, Rr_sel)
+		corr_sel = np.einsum('pmi,pm->pi', Rr_sel, Yy[act_idxs])
+		try:
+			x_act = np.linalg.solve(gram_sel, corr_sel[..., None])[..., 0]
+		except np.linalg.LinAlgError:
+			x_act = np.array([np.linalg.lstsq(Rr_sel[iP], Yy[act_idx], 
+								rcond=None)[0] for iP, act_idx 
+								in enumerate(act_idxs)])
+		x_sel[act_idxs, :iK + 1] = x_act
+		resid[act_idxs] = Yy[act_idxs] - \
+							np.einsum('pmi,pi->pm', Rr_sel, x_act)
+	
+	# Place the selected components; unused slots are not written
+	x = np.zeros((num_probs, Nn))
+	rows, cols = np.nonzero(np.arange(num_nonzero) < num_sel[:, None])
+	x[rows, idxs[rows, cols]] = x_sel[rows, cols]
 	
-	return res.x
+	return x
+
+def decode_LP(Rr, Yy):
+	"""
+	Minimize |x|_1 subject to Rr.x = Yy, written as the linear program
+	min sum(u + v) subject to Rr.(u - v) = Yy, u, v >= 0, with x = u - v.
+	
+	Args:
+		Rr: numpy array; measurement matrix.
+		Yy: numpy array; Measured signal.
+		
+	Returns:
+		x: numpy array; the decoded signal.
+	"""
+	
+	Nn = Rr.shape[1]
+	res = linprog(np.ones(2*Nn), A_eq=np.hstack([Rr, -Rr]), b_eq=Yy, 
+					bounds=(0, None), method=LINPROG_METHOD)
+	
+	return res.x[:Nn] - res.x[Nn:]
+
+def decode_LSMR(Rr, Yy, x0=None, max_iter=1000, tol=1e-10):
+	"""
+	Minimum norm least squares solution of Rr.x = Yy by LSMR, which only
+	needs products with Rr and its transpose. The measurement matrices 
+	are badly conditioned, so LSMR is not stopped on its estimate of the
+	condition number.
+	
+	Args:
+		Rr: numpy array or scipy sparse matrix; measurement matrix.
+		Yy: numpy array; Measured signal.
+	
+	Optional args:
+		x0: numpy array; initial iterate. Defaults to zero.
+		max_iter: Int; maximum number of iterations.
+		tol: Float; relative tolerance on the residual (atol and btol).
+		
+	Returns:
+		x: numpy array; the decoded signal.
+	"""
+	
+	if x0 is None:
+		x0 = np.zeros(Rr.shape[1])
+	else:
+		x0 = np.array(x0, dtype=float)
+	
+	# Solve for the correction to x0
+	dx = lsmr(Rr, Yy - Rr.dot(x0), atol=tol, btol=tol, conlim=0, 
+				maxiter=max_iter)[0]
+	
+	return x0 + dx
+
+def thresholded_csr(Rr, tol, max_density=0.2):
+	"""
+	Drop the entries of Rr with magnitude below tol, and return the
+	result as a CSR matrix if few enough entries remain.
+	
+	Args:
+		Rr: numpy array; measurement matrix.
+		tol: Float; entries with absolute value below tol are dropped.
+		max_density: Float; largest fraction of retained entries for 
+			which the sparse matrix is returned.
+			
+	Returns:
+		Rr_csr: scipy.sparse.csr_matrix if the retained fraction is at 
+			most max_density, else Rr unchanged.
+	"""
+	
+	keep = abs(Rr) >= tol
+	if np.count_nonzero(keep) > max_density*Rr.size:
+		return Rr
+	
+	return sparse.csr_matrix(Rr*keep)
+
+def decode_FISTA(Rr, Yy, precision, x0=None, max_iter=10000, tol=1e-6):
+	"""
+	Minimize |x|_1 + precision*|Rr.x - Yy|^2 by fast iterative 
+	soft-thresholding (proximal gradient with Nesterov momentum).
+	
+	Args:
+		Rr: numpy array or scipy sparse matrix; measurement matrix.
+		Yy: numpy array; Measured signal.
+		precision: Float; the multiplier of the squared error.
+	
+	Optional args:
+		x0: numpy array; initial iterate. Defaults to zero.
+		max_iter: Int; maximum number of iterations.
+		tol: Float; stop when the relative change of the iterate is 
+			below this value.
+	"""
+	
+	# Lipschitz constant of the gradient of the squared error
+	if sparse.issparse(Rr):
+		Rr_norm = svdvals(Rr.toarray(), check_finite=False)[0]
+	else:
+		Rr_norm = svdvals(Rr, check_finite=False)[0]
+	lipschitz = 2.*precision*Rr_norm**2.0
+	thresh = 1./lipschitz
+	
+	if x0 is None:
+		x = np.zeros(Rr.shape[1])
+	else:
+		x = np.array(x0, dtype=float)
+	z = x
+	t = 1.
+	
+	# Method calls, so a sparse Rr uses its own mat-vec products
+	Rr_T = Rr.T
+	for iT in range(max_iter):
+		grad = 2.*precision*Rr_T.dot(Rr.dot(z) - Yy)
+		z = z - grad/lipschitz
+		x_new = np.sign(z)*np.maximum(abs(z) - thresh, 0)
+		
+		t_new = (1. + np.sqrt(1. + 4.*t**2.0))/2.
+		z = x_new + (t - 1.)/t_new*(x_new - x)
+		
+		x_norm = np.sqrt(np.sum(x**2.0))
+		dx_norm = np.sqrt(np.sum((x_new - x)**2.0))
+		x, t = x_new, t_new
+		if dx_norm <= tol*max(x_norm, 1e-12):
+			break
+	
+	return x
 	
 def decode_nonlinear_CS(obj, opt_type="L1_strong", precision='None', 
-				init_params=[sp.random.rand()*-0.1, sp.random.rand()*0.1]):
+				init_params=[np.random.rand()*-0.1, np.random.rand()*0.1]):
 	"""
 	Run CS decoding with L1 norm, using full activity with no linearization.
 	
@@ -68,17 +376,24 @@ def decode_nonlinear_CS(obj, opt_type="L1_strong", precision='None',
 	"""		
 
 	def L1_strong(x):
-		return sp.sum(abs(x))
+		return np.sum(abs(x))
+	
+	def L1_strong_jac(x):
+		return np.sign(x)
 
-	from kinetics import receptor_activity
+	from kinetics import receptor_activity, linear_gain
 	
 	if opt_type == "L1_strong":
+		# The Jacobian of the activity is the linearized gain at x
 		constraints = ({'type': 'eq', 'fun': lambda x: 
-						receptor_activity(x, obj.Kk1, obj.Kk2, obj.eps) - obj.Yy})
+						receptor_activity(x, obj.Kk1, obj.Kk2, obj.eps) - obj.Yy, 
+						'jac': lambda x: 
+						linear_gain(x, obj.Kk1, obj.Kk2, obj.eps)})
 		res = minimize(L1_strong, 
-						obj.Ss*sp.random.normal(1, 0.1, obj.Nn),
-						#sp.random.normal(init_params[0], init_params[1], obj.Nn), 
-						method='SLSQP', constraints = constraints)
+						obj.Ss*np.random.normal(1, 0.1, obj.Nn),
+						#np.random.normal(init_params[0], init_params[1], obj.Nn), 
+						jac=L1_strong_jac, method='SLSQP', 
+						constraints = constraints)
 	else:
 		print ('Unknown optimization type')
 		quit()
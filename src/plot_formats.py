@@ -9,7 +9,7 @@ To view a copy of this license,
 visit http://creativecommons.org/licenses/by-nc-sa/4.0/.
 """
 
-import scipy as sp
+import numpy as np
 from local_methods import def_data_dir
 from matplotlib import rc
 rc('font', **{'family': 'serif', 'serif': ['Computer Modern']})
@@ -9,7 +9,7 @@ To view a copy of this license,
 visit http://creativecommons.org/licenses/by-nc-sa/4.0/.
 """
 
-import scipy as sp
+import numpy as np
 import pickle
 import shelve
 import gzip
@@ -27,6 +27,10 @@ from local_methods import def_data_dir, def_analysis_dir
 DATA_DIR = def_data_dir()
 ANALYSIS_DIR = def_analysis_dir()
 
+# gzip level for pickled objects; low levels compress numeric arrays nearly 
+# as well as the default of 9 at a fraction of the write time.
+GZIP_COMPRESSLEVEL = 1
+
 
 def save_MSE_errors(errors_nonzero, errors_zero, data_flag):
 	"""
@@ -42,7 +46,7 @@ def save_MSE_errors(errors_nonzero, errors_zero, data_flag):
 		os.makedirs(out_dir)
 
 	filename = '%s/MSE_errors.npz' % out_dir
-	sp.savez(filename, errors_nonzero=errors_nonzero, errors_zero=errors_zero)
+	np.savez(filename, errors_nonzero=errors_nonzero, errors_zero=errors_zero)
 	print('\nSignal errors file saved to %s' % filename)
 			
 def save_binary_errors(errors_nonzero, errors_zero, data_flag):
@@ -63,7 +67,7 @@ def save_binary_errors(errors_nonzero, errors_zero, data_flag):
 		os.makedirs(out_dir)
 
 	filename = '%s/binary_errors.npz' % out_dir
-	sp.savez(filename, errors_nonzero=errors_nonzero, errors_zero=errors_zero)
+	np.savez(filename, errors_nonzero=errors_nonzero, errors_zero=errors_zero)
 	print('\nSignal errors file saved to %s' % filename)
 
 def save_binary_errors_dual_odor(errors_nonzero, errors_nonzero_2, 
@@ -87,7 +91,7 @@ def save_binary_errors_dual_odor(errors_nonzero, errors_nonzero_2,
 		os.makedirs(out_dir)
 
 	filename = '%s/binary_errors.npz' % out_dir
-	sp.savez(filename, errors_nonzero=errors_nonzero, 
+	np.savez(filename, errors_nonzero=errors_nonzero, 
 				errors_nonzero_2=errors_nonzero_2, 
 				errors_zero=errors_zero)
 	print('\nSignal errors file saved to %s' % filename)
@@ -130,7 +134,7 @@ def dump_objects(CS_obj, iter_vars_idxs, data_flag, output=True):
 		os.makedirs(out_dir)
 	
 	filename = '%s/%s.pklz' % (out_dir, iter_vars_idxs)
-	with  gzip.open(filename, 'wb') as f:
+	with gzip.open(filename, 'wb', compresslevel=GZIP_COMPRESSLEVEL) as f:
 		pickle.dump(CS_obj, f, protocol=pickle.HIGHEST_PROTOCOL)
 	if output == True:
 		print("\n -- Object array item %s saved." % str(iter_vars_idxs))
@@ -146,11 +150,64 @@ def save_aggregated_object_list(agg_obj_list, data_flag):
 	
 	filename = '%s/objects/%s/aggregated_objects.pklz' % (DATA_DIR, data_flag)
 
-	with gzip.open(filename, 'wb') as f:
+	with gzip.open(filename, 'wb', compresslevel=GZIP_COMPRESSLEVEL) as f:
 		pickle.dump(agg_obj_list, f, protocol=pickle.HIGHEST_PROTOCOL)
 
 	print('Aggregated object file %s saved.' % filename)
 
+def save_aggregated_arrays(agg_obj_list, iter_vars_dims, data_flag, 
+							structs_to_save=['dSs', 'dSs_est', 'Ss0', 'Yy', 
+							'dYy', 'eps', 'Rr']):
+	"""
+	Save numeric attributes of aggregated objects as stacked arrays, one 
+	uncompressed .npy file per attribute, so they can be memory-mapped 
+	by load_aggregated_arrays without unpickling every object.
+	
+	Args:
+		agg_obj_list: List of four_state_receptor_CS objects; entries may
+			be None for skipped items, which are filled with NaN.
+		iter_vars_dims: list of dimensions of iterated variables.
+		data_flag: Data identifier for loading and saving.
+		structs_to_save: list of object attributes to stack. Attributes 
+			whose shape varies over the iterated variables are skipped.
+	"""
+	
+	out_dir = '%s/objects/%s/aggregated_arrays' % (DATA_DIR, data_flag)
+	if not os.path.exists(out_dir):
+		os.makedirs(out_dir)
+	
+	objs = [obj for obj in agg_obj_list if obj is not None]
+	if len(objs) == 0:
+		print('No objects to save as aggregated arrays.')
+		return
+	
+	for struct_name in structs_to_save:
+		try:
+			shapes = set(np.shape(getattr(obj, struct_name)) for obj in objs)
+		except AttributeError:
+			print('%s not an attribute of the CS object' % struct_name)
+			continue
+		if len(shapes) > 1:
+			print('%s changes shape over iterated variables; not saved' 
+					% struct_name)
+			continue
+		
+		# shape is (iterated var ranges, variable shape)
+		struct_shape = tuple(iter_vars_dims) + shapes.pop()
+		struct_array = np.empty(struct_shape)
+		struct_array_flat = np.reshape(struct_array, 
+										(len(agg_obj_list), ) + 
+										struct_shape[len(iter_vars_dims):])
+		for iObj, obj in enumerate(agg_obj_list):
+			if obj is None:
+				struct_array_flat[iObj] = np.nan
+			else:
+				struct_array_flat[iObj] = getattr(obj, struct_name)
+		
+		np.save('%s/%s.npy' % (out_dir, struct_name), struct_array)
+	
+	print('Aggregated arrays saved to %s.' % out_dir)
+
 def save_aggregated_temporal_objects(agg_obj_dict, data_flag):
 	"""
 	Save the dictionary of aggregated objects in a temporal CS run.
@@ -166,7 +223,7 @@ def save_aggregated_temporal_objects(agg_obj_dict, data_flag):
 	filename = '%s/objects/%s/aggregated_temporal_objects.pklz' \
 				% (DATA_DIR, data_flag)
 
-	with gzip.open(filename, 'wb') as f:
+	with gzip.open(filename, 'wb', compresslevel=GZIP_COMPRESSLEVEL) as f:
 		pickle.dump(agg_obj_dict, f, protocol=pickle.HIGHEST_PROTOCOL)
 
 	print('Aggregated temporal object file %s saved.' % filename)
@@ -186,7 +243,7 @@ def save_aggregated_entropy_objects(agg_obj_dict, data_flag):
 	filename = '%s/objects/%s/aggregated_entropy_objects.pklz' \
 				% (DATA_DIR, data_flag)
 
-	with gzip.open(filename, 'wb') as f:
+	with gzip.open(filename, 'wb', compresslevel=GZIP_COMPRESSLEVEL) as f:
 		pickle.dump(agg_obj_dict, f, protocol=pickle.HIGHEST_PROTOCOL)
 
 	print('Aggregated entropy calculation object file %s saved.' % filename)
@@ -208,6 +265,6 @@ def save_success_ratios(successes, data_flag):
 		os.makedirs(out_dir)
 
 	filename = '%s/successes.npz' % out_dir
-	sp.savez(filename, successes=successes)
+	np.savez(filename, successes=successes)
 	print('\nSignal binary successes file saved to %s' % filename)
 	
@@ -9,7 +9,7 @@ To view a copy of this license,
 visit http://creativecommons.org/licenses/by-nc-sa/4.0/.
 """
 
-import scipy as sp
+import numpy as np
 import sys
 
 def get_flags():
@@ -68,7 +68,7 @@ def noisify(Ss, params=[0, 1]):
 	
 	mu, sigma = params
 	size = Ss.shape
-	Ss += sp.random.normal(mu, sigma, size)
+	Ss += np.random.normal(mu, sigma, size)
 	
 	return Ss
 
@@ -104,10 +104,10 @@ def project_tensor(tensor, axes, projection_components, projected_axes):
 		elif idx == projected_axes[1]:
 			pass
 		else:
-			proj_axis = list(axes.keys()).index(name)
+			proj_axis = idx
 			
 			try:
-				print(('Setting %s fixed..' % name))
+				print('Setting %s fixed..' % name)
 				proj_element = projection_components[name]
 			except:
 				print ('Need to specify iterated variable values that ' \
@@ -118,10 +118,10 @@ def project_tensor(tensor, axes, projection_components, projected_axes):
 			assert (proj_element < len(axes[name])), \
 					'Fixed index out of range, %s >= %s'\
 					% (proj_element, len(axes[name]))
-			proj_vec = sp.zeros(len(axes[name]))
+			proj_vec = np.zeros(len(axes[name]))
 			proj_vec[proj_element] = 1.0
 			
-			tensor = sp.tensordot(tensor, proj_vec, [proj_axis, 0])
+			tensor = np.tensordot(tensor, proj_vec, [proj_axis, 0])
 	
 	return tensor
 	
@@ -130,15 +130,15 @@ def clip_array(array_dict, min=1e-10, max=1e10):
 	Clip an array to a particular interval.
 	"""
 	
-	for name, array in list(array_dict.items()):
+	for name, array in array_dict.items():
 		
-		lower_bound_elements = sp.sum(array < min)
+		lower_bound_elements = np.sum(array < min)
 		if lower_bound_elements > 0:
 			print('Clipping %s; %s lower bound elements' \
 					% (name, lower_bound_elements))
 			array_dict[name] = array.clip(min=min)
 	
-		upper_bound_elements = sp.sum(array > max)
+		upper_bound_elements = np.sum(array > max)
 		if upper_bound_elements > 0:
 			print('Clipping %s; %s upper bound elements' \
 					% (name, upper_bound_elements))
@@ -146,15 +146,33 @@ def clip_array(array_dict, min=1e-10, max=1e10):
 	
 	return array_dict
 	
+def clip_inplace(array, name='array', min=1e-10, max=1e10):
+	"""
+	Clip an array to a particular interval, in place.
+	"""
+	
+	lower_bound_elements = np.sum(array < min)
+	if lower_bound_elements > 0:
+		print('Clipping %s; %s lower bound elements' \
+				% (name, lower_bound_elements))
+	
+	upper_bound_elements = np.sum(array > max)
+	if upper_bound_elements > 0:
+		print('Clipping %s; %s upper bound elements' \
+				% (name, upper_bound_elements))
+	
+	if (lower_bound_elements > 0) or (upper_bound_elements > 0):
+		np.clip(array, min, max, out=array)
+	
 def scramble(a, axis=-1):
     """
     Return an array with the values of `a` independently shuffled along the
     given axis
     """
 	
-    b = sp.random.random(a.shape)
-    idx = sp.argsort(b, axis=axis)
-    shuffled = a[sp.arange(a.shape[0])[:, None], idx]
+    b = np.random.random(a.shape)
+    idx = np.argsort(b, axis=axis)
+    shuffled = a[np.arange(a.shape[0])[:, None], idx]
 	
     return shuffled
 				
@@ -165,10 +183,10 @@ def normal_pdf(x, means, sigmas):
 	the second axis of x. Requires that x.shape[1] == len(means), len(sigmas)
 	"""
 	
-	C = 1./sp.sqrt(2*sp.pi*sigmas**2.0)
+	C = 1./np.sqrt(2*np.pi*sigmas**2.0)
 	arg = (x - means)**2.0/2.0/sigmas**2.0
 	
-	return C*sp.exp(-arg)
+	return C*np.exp(-arg)
 	
 def tf_set_train_test_idxs(num_concs, num_signals, num_trains, shuffle_type):
 	"""
@@ -178,8 +196,8 @@ def tf_set_train_test_idxs(num_concs, num_signals, num_trains, shuffle_type):
 	
 	if shuffle_type == 'random':
 		
-		shuff_idxs = sp.arange(num_concs*num_signals)
-		sp.random.shuffle(shuff_idxs)
+		shuff_idxs = np.arange(num_concs*num_signals)
+		np.random.shuffle(shuff_idxs)
 		train_idxs = shuff_idxs[:num_trains]
 		test_idxs = shuff_idxs[num_trains:]
 		
@@ -190,18 +208,12 @@ def tf_set_train_test_idxs(num_concs, num_signals, num_trains, shuffle_type):
 			" of tf_num_trains if using tf_shuffle_type of `train_low_conc`"
 		conc_train_len = int(conc_train_len)
 		
-		# Training signals come from lower concentrations
-		train_idxs = sp.arange(conc_train_len)
-		for idx in range(1, num_signals):
-			add_arr = sp.arange(idx*num_concs, idx*num_concs + conc_train_len)
-			train_idxs = sp.append(train_idxs, add_arr)
-		
-		# Testing signals come from higher concentrations
-		test_idxs = sp.arange(conc_train_len, num_concs)
-		for idx in range(1, num_signals):
-			add_arr = sp.arange(idx*num_concs + conc_train_len, 
-						(idx + 1)*num_concs)
-			test_idxs = sp.append(test_idxs, add_arr)
+		# Training signals come from lower concentrations, testing signals
+		# from higher; rows are signals, columns are concentrations
+		signal_offsets = np.arange(num_signals)[:, None]*num_concs
+		train_idxs = (signal_offsets + np.arange(conc_train_len)).flatten()
+		test_idxs = (signal_offsets + 
+						np.arange(conc_train_len, num_concs)).flatten()
 		
 	else:
 		